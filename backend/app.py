@@ -1,12 +1,26 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
 import datetime as dt
-import pandas as pd
-from model_loader import TrafficModel
+import numpy as np
+from model_loader import parse_datetime, haversine_distance_array
+from prediction_cache import PredictionCache
+from response_cache import ResponseCache, DEFAULT_VERSION_FILE
+from model_registry import ModelRegistry
+from metrics import REGISTRY as METRICS, REQUEST_SECONDS, REQUESTS_TOTAL, PREDICT_STAGE_SECONDS, DB_SESSION_SECONDS, BCRYPT_SECONDS
 from math import radians, cos, sin, asin, sqrt
-from database import get_db, init_db, SearchHistory, Favorite, User
+from database import get_db, init_db, SearchHistory, Favorite, User, favorite_route_key
+from history_writer import HistoryWriter
 from contextlib import contextmanager
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+import atexit
+import base64
 import bcrypt
+import hmac
+import json
+import math
+import os
+import time
 
 # ======================
 #  Flask Uygulaması
@@ -28,22 +42,156 @@ except Exception as e:
 
 @contextmanager
 def get_db_session():
-    """Database session context manager"""
+    """Database session context manager (süresi db_session_duration_seconds'a yazılır)"""
     from database import SessionLocal
+    started = time.perf_counter()
+    outcome = "commit"
     db = SessionLocal()
     try:
         yield db
         db.commit()
     except Exception as e:
+        outcome = "rollback"
         db.rollback()
         raise e
     finally:
         db.close()
+        DB_SESSION_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
 
 # ======================
 #  ROTA BAZLI MODEL YÜKLEME
 # ======================
-route_model = TrafficModel()  # trafik_modeli.pkl dosyasını yükler
+# Tahmin önbelleği (PREDICTION_CACHE_SIZE=0 ile kapatılabilir)
+# Koordinatlar PREDICTION_CACHE_PRECISION basamağa yuvarlanır (3 ≈ 110 m)
+prediction_cache = PredictionCache(
+    max_size=int(os.getenv('PREDICTION_CACHE_SIZE', 10000)),
+    ttl=float(os.getenv('PREDICTION_CACHE_TTL', 0)) or None,
+    precision=int(os.getenv('PREDICTION_CACHE_PRECISION', 3))
+)
+
+# Versiyonlu modeller MODEL_DIR/<versiyon>/trafik_modeli.pkl altında durur,
+# MODEL_DIR/CURRENT aktif versiyonu gösterir. CURRENT yoksa trafik_modeli.pkl yüklenir.
+# MODEL_MODE=grid ile tahminler önceden hesaplanmış hız grid'inden okunur
+# MODEL_MMAP=1 ile derlenmiş model bellek eşlemeli açılır (süreçler arası paylaşılır)
+model_registry = ModelRegistry(
+    os.getenv('MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')),
+    mode=os.getenv('MODEL_MODE', 'forest'),
+    mmap=os.getenv('MODEL_MMAP', '0') == '1'
+)
+model_registry.on_swap(lambda model: prediction_cache.reset(model_path=model.model_path))
+# Model import sırasında yüklenmez: start_background_tasks() yüklemeyi arka planda
+# başlatır, sunucu portu hemen açar. Hazır olana kadar /ready ve /predict 503 döner.
+
+# CURRENT değişikliklerini kontrol etme aralığı (saniye, 0: kapalı)
+MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', 5))
+# POST /admin/reload-model için Bearer token (tanımlı değilse endpoint kapalı)
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+# GET /history ve GET /favorites yanıt önbelleği: kullanıcı başına versiyon, ETag/304.
+# RESPONSE_CACHE_MAX_BYTES=0 gövde önbelleğini kapatır.
+# Versiyonlar worker'lar arasında RESPONSE_CACHE_VERSION_FILE üzerinden paylaşılır;
+# bu dosya makineye özeldir. Başka bir sunucudaki yazma versiyonu değiştiremediği
+# için kayıtlar varsayılan olarak RESPONSE_CACHE_TTL=30 saniye sonra yeniden okunur.
+# 0 süresiz demektir; yalnızca veritabanına tek bir makine yazıyorsa kullanın.
+response_cache = ResponseCache(
+    max_bytes=int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    ttl=float(os.getenv('RESPONSE_CACHE_TTL', 30)) or None,
+    version_file=os.getenv('RESPONSE_CACHE_VERSION_FILE', DEFAULT_VERSION_FILE)
+)
+
+# HISTORY_WRITE_BEHIND=1: POST /history kaydı kuyruğa alıp 202 döner, arka plandaki
+# yazıcı HISTORY_BATCH_SIZE kayıtlık gruplar ya da HISTORY_FLUSH_INTERVAL saniyede
+# bir toplu ekler. Kuyruk (HISTORY_QUEUE_SIZE) doluysa HISTORY_ENQUEUE_TIMEOUT
+# saniye beklenir, yer açılmazsa 503 döner.
+HISTORY_WRITE_BEHIND = os.getenv('HISTORY_WRITE_BEHIND', '0') == '1'
+history_writer = HistoryWriter(
+    get_db_session,
+    max_queue=int(os.getenv('HISTORY_QUEUE_SIZE', 10000)),
+    batch_size=int(os.getenv('HISTORY_BATCH_SIZE', 200)),
+    flush_interval=float(os.getenv('HISTORY_FLUSH_INTERVAL', 0.5)),
+    enqueue_timeout=float(os.getenv('HISTORY_ENQUEUE_TIMEOUT', 0.1)),
+    on_write=lambda user_ids: response_cache.invalidate('history', user_ids)
+)
+# Normal kapanışta (Ctrl+C, gunicorn worker çıkışı) kuyrukta kalanlar yazılır
+atexit.register(history_writer.stop)
+
+def get_route_model():
+    """Aktif modeli döndürür (yüklü değilse None).
+
+    Model yeniden yüklenirken referans değişebileceği için her istek bunu bir
+    kez çağırıp aynı nesneyle devam etmelidir.
+    """
+    return model_registry.current
+
+def start_background_tasks():
+    """Süreç başına arka plan işlerini başlatır (gunicorn'da fork sonrası çağrılır).
+
+    Model henüz yüklenmediyse yükleme arka planda başlar. Birden fazla
+    çağrılması sorun değildir.
+    """
+    model_registry.load_in_background()
+    model_registry.start_watcher(MODEL_WATCH_INTERVAL)
+    if HISTORY_WRITE_BEHIND:
+        history_writer.start()
+
+@app.before_request
+def ensure_background_tasks():
+    # serve.py / gunicorn.conf.py dışında bir sunucuyla çalıştırılırsa (ör. gunicorn app:app)
+    # model yüklemesi ilk istekle başlar
+    if model_registry.status() == 'not_started':
+        start_background_tasks()
+
+# ======================
+#  METRİKLER
+# ======================
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """İstek süresini ve durum kodunu endpoint (URL kuralı) bazında kaydeder"""
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route=route, method=request.method)
+        REQUESTS_TOTAL.inc(route=route, method=request.method, status=response.status_code)
+    return response
+
+METRICS.callback('prediction_cache_hits_total', 'Tahmin önbelleği isabetleri',
+                 lambda: prediction_cache.hits, type_name='counter')
+METRICS.callback('prediction_cache_misses_total', 'Tahmin önbelleği ıskaları',
+                 lambda: prediction_cache.misses, type_name='counter')
+METRICS.callback('prediction_cache_evictions_total', 'Kapasite nedeniyle atılan kayıtlar',
+                 lambda: prediction_cache.evictions, type_name='counter')
+METRICS.callback('prediction_cache_hit_ratio', 'Süreç başından beri isabet oranı',
+                 lambda: prediction_cache.stats()["hit_ratio"])
+METRICS.callback('prediction_cache_size', 'Önbellekteki kayıt sayısı',
+                 lambda: prediction_cache.stats()["size"])
+METRICS.callback('response_cache_hits_total', 'Geçmiş/favori yanıt önbelleği isabetleri',
+                 lambda: response_cache.hits, type_name='counter')
+METRICS.callback('response_cache_misses_total', 'Geçmiş/favori yanıt önbelleği ıskaları',
+                 lambda: response_cache.misses, type_name='counter')
+METRICS.callback('response_cache_evictions_total', 'Boyut sınırı nedeniyle atılan yanıtlar',
+                 lambda: response_cache.evictions, type_name='counter')
+METRICS.callback('response_cache_bytes', 'Önbellekteki yanıt gövdelerinin toplam boyutu',
+                 lambda: response_cache.stats()["bytes"])
+METRICS.callback('history_queue_depth', 'Write-behind kuyruğunda bekleyen geçmiş kaydı',
+                 history_writer.depth)
+METRICS.callback('model_ready', 'Model yüklü ve ısıtılmışsa 1',
+                 lambda: 1 if model_registry.current is not None else 0)
+def _model_info():
+    route_model = model_registry.current
+    return {(route_model.version, route_model.serving_mode): 1} if route_model is not None else {}
+
+METRICS.callback('model_info', 'Servis edilen model versiyonu ve modu', _model_info,
+                 labelnames=('version', 'serving_mode'))
+
+def model_unavailable_response():
+    """Model yokken dönülecek cevap: yükleniyorsa 503 + Retry-After, yüklenemediyse 500"""
+    if model_registry.status() == 'failed':
+        return jsonify({"error": "Rota modeli yüklü değil"}), 500
+    return jsonify({"error": "Rota modeli yükleniyor, lütfen tekrar deneyin"}), 503, {"Retry-After": "1"}
 
 # Trafik seviyesi label mapping
 CLASS_LABELS = {
@@ -52,29 +200,33 @@ CLASS_LABELS = {
     2: "Çok"
 }
 
+# /predict/batch için tek istekteki en fazla rota sayısı
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 500))
+# /predict/departures için tek istekte değerlendirilecek en fazla zaman dilimi
+MAX_SWEEP_SLOTS = int(os.getenv('MAX_SWEEP_SLOTS', 288))
+# /predict/matrix için en fazla hücre sayısı ve modelin tek seferde gördüğü blok boyu
+MAX_MATRIX_CELLS = int(os.getenv('MAX_MATRIX_CELLS', 250000))
+MATRIX_CHUNK_CELLS = int(os.getenv('MATRIX_CHUNK_CELLS', 50000))
+# /predict/segments için en fazla parça sayısı (gecikme bütçesini sabit tutar)
+MAX_SEGMENTS = int(os.getenv('MAX_SEGMENTS', 50))
+
 # ======================
 #  YARDIMCI FONKSİYONLAR
 # ======================
-def apply_time_factor(base_speed, datetime_str):
-    """Saat faktörünü uygular"""
-    dt_obj = pd.to_datetime(datetime_str)
-    hour = dt_obj.hour
-    
-    adjusted_speed = base_speed
-    
-    if hour >= 22 or hour < 6:
-        adjusted_speed = base_speed * 1.4 
-    elif 7 <= hour <= 10:
-        adjusted_speed = base_speed * 0.7
-    elif 17 <= hour <= 20:
-        adjusted_speed = base_speed * 0.65
-    else:
-        adjusted_speed = base_speed * 1.1
-    
-    if adjusted_speed < 5: adjusted_speed = 5
-    if adjusted_speed > 130: adjusted_speed = 130
-    
-    return adjusted_speed
+def apply_time_factor(base_speed, when):
+    """Saat faktörünü uygular (when: datetime nesnesi veya ISO formatlı metin)"""
+    return float(apply_time_factor_array(base_speed, parse_datetime(when).hour))
+
+def apply_time_factor_array(base_speeds, hours):
+    """Saat faktörünü hız ve saat dizilerinin tamamına tek seferde uygular"""
+    base_speeds = np.asarray(base_speeds, dtype=float)
+    hours = np.asarray(hours)
+    factors = np.select(
+        [(hours >= 22) | (hours < 6), (hours >= 7) & (hours <= 10), (hours >= 17) & (hours <= 20)],
+        [1.4, 0.7, 0.65],
+        default=1.1
+    )
+    return np.clip(base_speeds * factors, 5, 130)
 
 def speed_to_traffic_level(speed):
     """Hız değerini trafik seviyesine çevirir"""
@@ -88,6 +240,131 @@ def speed_to_traffic_level(speed):
     else:
         return 2, "Çok"  # Yoğun trafik
 
+def parse_route_request(data):
+    """İstek gövdesinden tarih ve rota koordinatlarını okur.
+
+    (dt_obj, start_lat, start_lon, end_lat, end_lon) döndürür, hatalı
+    girdide kullanıcıya gösterilecek mesajla ValueError fırlatır.
+    """
+    datetime_str = data.get("datetime")
+    if not datetime_str:
+        raise ValueError("datetime alanı zorunlu")
+
+    try:
+        dt_obj = dt.datetime.fromisoformat(datetime_str)
+    except (TypeError, ValueError):
+        raise ValueError("datetime formatı hatalı. Örnek: 2025-11-27T08:30")
+
+    try:
+        start_lat = float(data.get("start_lat"))
+        start_lon = float(data.get("start_lon"))
+        end_lat = float(data.get("end_lat"))
+        end_lon = float(data.get("end_lon"))
+    except (TypeError, ValueError):
+        raise ValueError("Rota koordinatları (start_lat, start_lon, end_lat, end_lon) zorunlu")
+    # float() "NaN", "inf" ve 1e400'ü de kabul eder
+    if not all(math.isfinite(value) for value in (start_lat, start_lon, end_lat, end_lon)):
+        raise ValueError("Rota koordinatları sonlu sayılar olmalı")
+
+    return dt_obj, start_lat, start_lon, end_lat, end_lon
+
+def parse_optional_user_id(data):
+    """İsteğe bağlı user_id alanını okur (yoksa None), hatalıysa ValueError fırlatır"""
+    user_id = data.get("user_id")
+    if user_id is None:
+        return None
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        raise ValueError("user_id sayı olmalı")
+
+def queue_prediction_history(user_id, data, dt_obj, start_lat, start_lon, end_lat, end_lon, result):
+    """/predict sonucunu geçmiş kaydı olarak write-behind kuyruğuna ekler.
+
+    Adres metni verilmezse koordinatlar yazılır. Kayıt POST /history ile aynı
+    doğrulamadan geçer; geçersizse ya da kuyruk doluysa beklemeden None
+    döner, tahmin cevabı bundan etkilenmez. Kuyruğa alındıysa kaydın
+    created_at değerini GET /history'deki biçimde, saniyeye yuvarlanmış
+    olarak döndürür (MySQL DATETIME saniye altını saklamaz).
+    """
+    origin = str(data.get("origin") or f"{start_lat:.5f}, {start_lon:.5f}")[:500]
+    destination = str(data.get("destination") or f"{end_lat:.5f}, {end_lon:.5f}")[:500]
+    row = {
+        "user_id": user_id,
+        "origin": origin,
+        "destination": destination,
+        "origin_lat": start_lat,
+        "origin_lon": start_lon,
+        "destination_lat": end_lat,
+        "destination_lon": end_lon,
+        "datetime": dt_obj,
+        "traffic_level": result["traffic_level"],
+        "traffic_label": result["traffic_label"],
+        "speed_kmh": result["speed_kmh"],
+        "estimated_minutes": result["estimated_minutes"],
+        "distance_km": result["distance_km"],
+        "created_at": dt.datetime.now(dt.timezone.utc)
+    }
+    error = validate_history_row(row)
+    if error:
+        print(f">> /predict geçmiş kaydı kuyruğa alınmadı: {error}")
+        return None
+    if not history_writer.enqueue(row, wait=False):
+        return None
+    return row["created_at"].replace(tzinfo=None, microsecond=0).isoformat()
+
+def predict_route_cached(route_model, start_lat, start_lon, end_lat, end_lon, dt_obj):
+    """route_model.predict_route çağrısını tahmin önbelleğinin arkasından yapar"""
+    started = time.perf_counter()
+    key = prediction_cache.make_key(start_lat, start_lon, end_lat, end_lon, dt_obj, route_model.version)
+    raw_speed = prediction_cache.get(key)
+    looked_up = time.perf_counter()
+    PREDICT_STAGE_SECONDS.observe(looked_up - started, stage="cache_lookup")
+    if raw_speed is None:
+        # Özellik satırının hazırlanması + model/grid tahmini
+        raw_speed = route_model.predict_route(start_lat, start_lon, end_lat, end_lon, dt_obj)
+        PREDICT_STAGE_SECONDS.observe(time.perf_counter() - looked_up, stage="model")
+        if raw_speed is not None:
+            prediction_cache.set(key, raw_speed)
+    return raw_speed
+
+def build_prediction_result(raw_speed, dt_obj, start_lat, start_lon, end_lat, end_lon):
+    """Ham model hızından /predict cevap gövdesini oluşturur"""
+    # Saat faktörünü uygula
+    final_speed = apply_time_factor(raw_speed, dt_obj)
+
+    # Mesafe hesapla (tahmini süre için)
+    R = 6371
+    lat1, lon1, lat2, lon2 = map(radians, [start_lat, start_lon, end_lat, end_lon])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    a = min(1.0, max(0.0, a))
+    distance_km = R * 2 * asin(sqrt(a)) if a > 0 else 0
+
+    # Trafik seviyesi ve tahmini süre
+    traffic_level, traffic_label = speed_to_traffic_level(final_speed)
+    estimated_minutes = round(distance_km / final_speed * 60, 1) if final_speed > 0 else 0
+
+    return {
+        "traffic_level": traffic_level,
+        "traffic_label": traffic_label,
+        "speed_kmh": round(final_speed, 1),
+        "raw_speed_kmh": round(raw_speed, 1),
+        "estimated_minutes": estimated_minutes,
+        "distance_km": round(distance_km, 2),
+        "used_features": {
+            "start_lat": start_lat,
+            "start_lon": start_lon,
+            "end_lat": end_lat,
+            "end_lon": end_lon,
+            "hour": dt_obj.hour,
+            "day_of_week": dt_obj.weekday(),
+            "month": dt_obj.month
+        },
+        "model_type": "route_based"
+    }
+
 # ======================
 #  AUTHENTICATION ENDPOINTLERİ
 # ======================
@@ -115,7 +392,8 @@ def register():
                 return jsonify({"error": "Bu e-posta adresi zaten kullanılıyor"}), 400
             
             # Şifreyi hash'le
-            password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+            with BCRYPT_SECONDS.time(operation="hash"):
+                password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
             
             # Yeni kullanıcı oluştur
             new_user = User(
@@ -157,7 +435,9 @@ def login():
                 return jsonify({"error": "E-posta veya şifre hatalı"}), 401
             
             # Şifreyi kontrol et
-            if not bcrypt.checkpw(password.encode('utf-8'), user.password_hash.encode('utf-8')):
+            with BCRYPT_SECONDS.time(operation="check"):
+                password_ok = bcrypt.checkpw(password.encode('utf-8'), user.password_hash.encode('utf-8'))
+            if not password_ok:
                 return jsonify({"error": "E-posta veya şifre hatalı"}), 401
             
             return jsonify({
@@ -173,16 +453,80 @@ def login():
 # ======================
 #  ENDPOINTLER
 # ======================
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus metin formatında metrikler (değerler bu sürece aittir)"""
+    return Response(METRICS.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Hazırlık kontrolü: model yüklenip ısıtıldıysa 200, aksi halde 503.
+
+    /health sürecin ayakta olduğunu gösterir (liveness) ve model yüklenirken de
+    200 döner; yük dengeleyici trafiği /ready 200 olunca göndermelidir.
+    """
+    route_model = get_route_model()
+    status = model_registry.status()
+    body = {
+        "ready": route_model is not None,
+        "status": status,
+        "model_version": route_model.version if route_model else None
+    }
+    if status == 'failed':
+        body["error"] = model_registry.load_error
+    return jsonify(body), 200 if route_model is not None else 503
+
 @app.route("/health", methods=["GET"])
 def health():
-    """Basit sağlık kontrol endpoint'i."""
-    route_status = "ok" if route_model.model is not None else "not_loaded"
+    """Basit sağlık kontrol endpoint'i (liveness, model yüklenirken de 200 döner)."""
+    route_model = get_route_model()
+    route_status = "ok" if route_model is not None else model_registry.status()
     return jsonify({
-        "status": "ok" if route_status == "ok" else "error",
+        "status": "error" if route_status == "failed" else "ok",
         "route_model": route_status,
-        "model_type": "route_based"
+        "model_type": "route_based",
+        "model_version": route_model.version if route_model else None,
+        "model_loaded_at": route_model.loaded_at.isoformat() if route_model else None,
+        "model_load_seconds": round(route_model.load_seconds, 3) if route_model else None,
+        "serving_mode": route_model.serving_mode if route_model else None,
+        "grid_error_budget": route_model.grid.meta.get("error_budget") if route_model and route_model.grid is not None else None,
+        "prediction_cache": prediction_cache.stats(),
+        "response_cache": response_cache.stats()
     }), 200
 
+@app.route("/admin/reload-model", methods=["POST"])
+def reload_model():
+    """
+    Modeli yeniden yükler. İsteğe bağlı "version" verilirse önce MODEL_DIR/CURRENT
+    o versiyona çevrilir (diğer worker'lar değişikliği izleyiciyle alır).
+    Yeni model arka planda yüklenip ısıtıldıktan sonra atomik olarak devreye girer.
+    Header: Authorization: Bearer <ADMIN_TOKEN>
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Admin endpoint'i kapalı (ADMIN_TOKEN tanımlı değil)"}), 403
+    auth = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(auth, f"Bearer {ADMIN_TOKEN}"):
+        return jsonify({"error": "Yetkisiz"}), 401
+
+    data = request.get_json(silent=True) or {}
+    version = data.get("version")
+    if version:
+        try:
+            model_registry.activate(version)
+        except ValueError as e:
+            return jsonify({"error": str(e), "versions": model_registry.versions()}), 404
+
+    # Versiyon verilmezse aktif versiyon diskten yeniden okunur (aynı versiyon olsa da);
+    # verilirse aynı değişikliği yakalayan izleyiciyle ikinci kez yüklenmez
+    model_registry.reload_async(version, force=not version)
+    route_model = get_route_model()
+    return jsonify({
+        "message": "Model arka planda yükleniyor",
+        "version": version or model_registry.active_version(),
+        "current_version": route_model.version if route_model else None,
+        "versions": model_registry.versions()
+    }), 202
+
 @app.route("/predict", methods=["POST"])
 def predict():
     """
@@ -195,76 +539,364 @@ def predict():
       "end_lat": 41.0421,
       "end_lon": 29.2510
     }
+
+    İsteğe bağlı "user_id" (ve "origin", "destination" adres metinleri)
+    verilirse arama, ayrı bir POST /history isteğine gerek kalmadan geçmişe
+    kaydedilir. Kayıt write-behind kuyruğuna eklenir, yanıt veritabanını
+    beklemez; cevaptaki "history_queued" kaydın kuyruğa alınıp alınmadığını
+    gösterir. Kuyruğa alındıysa "history_created_at" kaydın created_at
+    değerinin alt sınırıdır: GET /history'de created_at bu değere eşit ya da
+    büyük bir kayıt göründüğünde kayıt yazılmıştır.
     """
-    if route_model.model is None:
-        return jsonify({"error": "Rota modeli yüklü değil"}), 500
+    route_model = get_route_model()
+    if route_model is None:
+        return model_unavailable_response()
 
+    started = time.perf_counter()
     data = request.get_json()
     if not data:
         return jsonify({"error": "JSON body bekleniyor"}), 400
 
-    # 1) Tarih & saat
-    datetime_str = data.get("datetime")
-    if not datetime_str:
-        return jsonify({"error": "datetime alanı zorunlu"}), 400
+    # 1-2) Tarih & saat, rota koordinatları
+    try:
+        dt_obj, start_lat, start_lon, end_lat, end_lon = parse_route_request(data)
+        user_id = parse_optional_user_id(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    PREDICT_STAGE_SECONDS.observe(time.perf_counter() - started, stage="parse")
 
+    # 3) Rota bazlı tahmin
     try:
-        dt_obj = dt.datetime.fromisoformat(datetime_str)
-        datetime_str_formatted = dt_obj.strftime("%Y-%m-%dT%H:%M")
-    except ValueError:
-        return jsonify({"error": "datetime formatı hatalı. Örnek: 2025-11-27T08:30"}), 400
+        raw_speed = predict_route_cached(route_model, start_lat, start_lon, end_lat, end_lon, dt_obj)
+    except Exception as e:
+        print(f">> Rota model tahmin hatası: {e}")
+        return jsonify({"error": f"Rota model tahmin hatası: {str(e)}"}), 500
+
+    if raw_speed is None:
+        return jsonify({"error": "Tahmin yapılamadı"}), 500
+
+    # 4-6) Saat faktörü, mesafe, trafik seviyesi ve tahmini süre
+    started = time.perf_counter()
+    result = build_prediction_result(raw_speed, dt_obj, start_lat, start_lon, end_lat, end_lon)
+    built = time.perf_counter()
+    PREDICT_STAGE_SECONDS.observe(built - started, stage="postprocess")
+
+    # 7) İsteğe bağlı geçmiş kaydı (kuyruğa eklenir, beklenmez)
+    if user_id is not None:
+        history_created_at = queue_prediction_history(
+            user_id, data, dt_obj, start_lat, start_lon, end_lat, end_lon, result
+        )
+        result["history_queued"] = history_created_at is not None
+        if history_created_at is not None:
+            result["history_created_at"] = history_created_at
+        PREDICT_STAGE_SECONDS.observe(time.perf_counter() - built, stage="history")
+        built = time.perf_counter()
+
+    response = jsonify(result)
+    PREDICT_STAGE_SECONDS.observe(time.perf_counter() - built, stage="serialize")
+    return response, 200
+
+
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    """
+    Toplu rota tahmini. Tüm rotalar tek bir model çağrısıyla tahmin edilir,
+    sonuçlar istek sırasıyla döner.
+    Beklenen JSON örneği:
+    {
+      "routes": [
+        {"datetime": "2025-11-27T08:30", "start_lat": 40.9982, "start_lon": 29.0643,
+         "end_lat": 41.0421, "end_lon": 29.2510},
+        ...
+      ]
+    }
+    """
+    route_model = get_route_model()
+    if route_model is None:
+        return model_unavailable_response()
+
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "JSON body bekleniyor"}), 400
+
+    routes = data.get("routes")
+    if not isinstance(routes, list) or not routes:
+        return jsonify({"error": "routes alanı boş olmayan bir liste olmalı"}), 400
+    if len(routes) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Tek istekte en fazla {MAX_BATCH_SIZE} rota gönderilebilir"}), 400
+
+    parsed = []
+    for i, route in enumerate(routes):
+        if not isinstance(route, dict):
+            return jsonify({"error": f"routes[{i}]: rota bir JSON nesnesi olmalı"}), 400
+        try:
+            parsed.append(parse_route_request(route))
+        except ValueError as e:
+            return jsonify({"error": f"routes[{i}]: {e}"}), 400
+
+    dt_objs, start_lats, start_lons, end_lats, end_lons = map(list, zip(*parsed))
 
-    # 2) Rota koordinatları
     try:
-        start_lat = float(data.get("start_lat"))
-        start_lon = float(data.get("start_lon"))
-        end_lat = float(data.get("end_lat"))
-        end_lon = float(data.get("end_lon"))
+        raw_speeds = route_model.predict_routes(start_lats, start_lons, end_lats, end_lons, dt_objs)
+    except Exception as e:
+        print(f">> Toplu rota model tahmin hatası: {e}")
+        return jsonify({"error": f"Rota model tahmin hatası: {str(e)}"}), 500
+
+    if raw_speeds is None:
+        return jsonify({"error": "Tahmin yapılamadı"}), 500
+
+    return jsonify({
+        "results": [
+            build_prediction_result(float(raw_speed), *route)
+            for raw_speed, route in zip(raw_speeds, parsed)
+        ],
+        "count": len(parsed),
+        "model_type": "route_based"
+    }), 200
+
+
+@app.route("/predict/departures", methods=["POST"])
+def predict_departures():
+    """
+    En iyi çıkış saati taraması. Tek bir rota için zaman penceresindeki her
+    dilim tek bir model çağrısıyla tahmin edilir.
+    Beklenen JSON örneği (datetime pencerenin başlangıcıdır):
+    {
+      "datetime": "2025-11-27T07:00",
+      "start_lat": 40.9982,
+      "start_lon": 29.0643,
+      "end_lat": 41.0421,
+      "end_lon": 29.2510,
+      "window_minutes": 360,
+      "step_minutes": 15
+    }
+    """
+    route_model = get_route_model()
+    if route_model is None:
+        return model_unavailable_response()
+
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "JSON body bekleniyor"}), 400
+
+    try:
+        dt_obj, start_lat, start_lon, end_lat, end_lon = parse_route_request(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        window_minutes = int(data.get("window_minutes", 360))
+        step_minutes = int(data.get("step_minutes", 15))
     except (TypeError, ValueError):
-        return jsonify({"error": "Rota koordinatları (start_lat, start_lon, end_lat, end_lon) zorunlu"}), 400
+        return jsonify({"error": "window_minutes ve step_minutes tam sayı olmalı"}), 400
+    if window_minutes < 0 or step_minutes <= 0:
+        return jsonify({"error": "window_minutes negatif olamaz, step_minutes pozitif olmalı"}), 400
+
+    slot_count = window_minutes // step_minutes + 1
+    if slot_count > MAX_SWEEP_SLOTS:
+        return jsonify({"error": f"Tek istekte en fazla {MAX_SWEEP_SLOTS} zaman dilimi değerlendirilebilir"}), 400
+
+    slots = [dt_obj + dt.timedelta(minutes=i * step_minutes) for i in range(slot_count)]
+    hours = np.array([s.hour for s in slots])
 
-    # 3) Rota bazlı tahmin
     try:
-        raw_speed = route_model.predict_route(start_lat, start_lon, end_lat, end_lon, datetime_str_formatted)
+        raw_speeds = route_model.predict_features(
+            start_lat, start_lon, end_lat, end_lon,
+            hours, [s.weekday() for s in slots], [s.month for s in slots]
+        )
     except Exception as e:
-        print(f">> Rota model tahmin hatası: {e}")
+        print(f">> Çıkış saati tahmin hatası: {e}")
         return jsonify({"error": f"Rota model tahmin hatası: {str(e)}"}), 500
 
-    if raw_speed is None:
+    if raw_speeds is None:
         return jsonify({"error": "Tahmin yapılamadı"}), 500
 
-    # 4) Saat faktörünü uygula
-    final_speed = apply_time_factor(raw_speed, datetime_str_formatted)
+    final_speeds = apply_time_factor_array(raw_speeds, hours)
+    distance_km = float(haversine_distance_array(start_lat, start_lon, end_lat, end_lon))
+    estimated_minutes = distance_km / final_speeds * 60
 
-    # 5) Mesafe hesapla (tahmini süre için)
-    R = 6371
-    lat1, lon1, lat2, lon2 = map(radians, [start_lat, start_lon, end_lat, end_lon])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    a = min(1.0, max(0.0, a))
-    distance_km = R * 2 * asin(sqrt(a)) if a > 0 else 0
+    results = []
+    for slot, raw_speed, final_speed, minutes in zip(slots, raw_speeds, final_speeds, estimated_minutes):
+        traffic_level, traffic_label = speed_to_traffic_level(final_speed)
+        results.append({
+            "datetime": slot.strftime("%Y-%m-%dT%H:%M"),
+            "traffic_level": traffic_level,
+            "traffic_label": traffic_label,
+            "speed_kmh": round(float(final_speed), 1),
+            "raw_speed_kmh": round(float(raw_speed), 1),
+            "estimated_minutes": round(float(minutes), 1)
+        })
 
-    # 6) Trafik seviyesi ve tahmini süre
-    traffic_level, traffic_label = speed_to_traffic_level(final_speed)
-    estimated_minutes = round(distance_km / final_speed * 60, 1) if final_speed > 0 else 0
+    return jsonify({
+        "slots": results,
+        "best": results[int(np.argmin(estimated_minutes))],
+        "distance_km": round(distance_km, 2),
+        "model_type": "route_based"
+    }), 200
+
+
+@app.route("/predict/segments", methods=["POST"])
+def predict_segments():
+    """
+    Parçalı rota tahmini. Rota "segments" parçaya bölünür, tüm parçalar tek
+    bir model çağrısıyla tahmin edilir; toplam süre parça sürelerinin toplamıdır.
+    Beklenen JSON örneği:
+    {
+      "datetime": "2025-11-27T08:30",
+      "start_lat": 40.9982,
+      "start_lon": 29.0643,
+      "end_lat": 41.0421,
+      "end_lon": 29.2510,
+      "segments": 12
+    }
+    """
+    route_model = get_route_model()
+    if route_model is None:
+        return model_unavailable_response()
+
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "JSON body bekleniyor"}), 400
+
+    try:
+        dt_obj, start_lat, start_lon, end_lat, end_lon = parse_route_request(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        num_segments = int(data.get("segments", 12))
+    except (TypeError, ValueError):
+        return jsonify({"error": "segments tam sayı olmalı"}), 400
+    if not 1 <= num_segments <= MAX_SEGMENTS:
+        return jsonify({"error": f"segments 1 ile {MAX_SEGMENTS} arasında olmalı"}), 400
+
+    try:
+        points, raw_speeds = route_model.predict_segments(
+            start_lat, start_lon, end_lat, end_lon, dt_obj, num_segments=num_segments
+        )
+    except Exception as e:
+        print(f">> Parçalı rota tahmin hatası: {e}")
+        return jsonify({"error": f"Rota model tahmin hatası: {str(e)}"}), 500
+
+    if raw_speeds is None:
+        return jsonify({"error": "Tahmin yapılamadı"}), 500
+
+    final_speeds = apply_time_factor_array(raw_speeds, dt_obj.hour)
+    distances = haversine_distance_array(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1])
+    minutes = distances / final_speeds * 60
+
+    total_distance = float(distances.sum())
+    total_minutes = float(minutes.sum())
+    average_speed = total_distance / total_minutes * 60 if total_minutes > 0 else float(final_speeds.mean())
+    traffic_level, traffic_label = speed_to_traffic_level(average_speed)
+
+    segments = []
+    for i in range(num_segments):
+        segment_level, segment_label = speed_to_traffic_level(final_speeds[i])
+        segments.append({
+            "index": i,
+            "start_lat": round(float(points[i, 0]), 6),
+            "start_lon": round(float(points[i, 1]), 6),
+            "end_lat": round(float(points[i + 1, 0]), 6),
+            "end_lon": round(float(points[i + 1, 1]), 6),
+            "traffic_level": segment_level,
+            "traffic_label": segment_label,
+            "speed_kmh": round(float(final_speeds[i]), 1),
+            "raw_speed_kmh": round(float(raw_speeds[i]), 1),
+            "distance_km": round(float(distances[i]), 3),
+            "estimated_minutes": round(float(minutes[i]), 2)
+        })
 
     return jsonify({
+        "segments": segments,
         "traffic_level": traffic_level,
         "traffic_label": traffic_label,
-        "speed_kmh": round(final_speed, 1),
-        "raw_speed_kmh": round(raw_speed, 1),
-        "estimated_minutes": estimated_minutes,
-        "distance_km": round(distance_km, 2),
-        "used_features": {
-            "start_lat": start_lat,
-            "start_lon": start_lon,
-            "end_lat": end_lat,
-            "end_lon": end_lon,
-            "hour": dt_obj.hour,
-            "day_of_week": dt_obj.weekday(),
-            "month": dt_obj.month
-        },
+        "speed_kmh": round(average_speed, 1),
+        "estimated_minutes": round(total_minutes, 1),
+        "distance_km": round(total_distance, 2),
+        "slowest_segment": int(np.argmin(final_speeds)),
+        "model_type": "route_based"
+    }), 200
+
+
+def parse_coordinate_list(points, field):
+    """[[lat, lon], ...] listesini (lats, lons) NumPy dizilerine çevirir"""
+    if not isinstance(points, list) or not points:
+        raise ValueError(f"{field} alanı boş olmayan bir [[lat, lon], ...] listesi olmalı")
+    try:
+        coords = np.array(points, dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} alanı sayısal [lat, lon] çiftlerinden oluşmalı")
+    if coords.ndim != 2 or coords.shape[1] != 2:
+        raise ValueError(f"{field} alanı [lat, lon] çiftlerinden oluşmalı")
+    # Derlenmiş orman sklearn gibi NaN/inf kontrolü yapmaz; sonlu olmayan değer yaprağa kadar iner
+    if not np.isfinite(coords).all():
+        raise ValueError(f"{field} alanındaki koordinatlar sonlu sayılar olmalı")
+    return coords[:, 0], coords[:, 1]
+
+
+@app.route("/predict/matrix", methods=["POST"])
+def predict_matrix():
+    """
+    Başlangıç-varış matrisi. N başlangıç ve M varış noktası için aynı saatte
+    N x M hız, mesafe ve tahmini süre matrisleri döner.
+    Beklenen JSON örneği:
+    {
+      "datetime": "2025-11-27T08:30",
+      "origins": [[40.9982, 29.0643], [41.0082, 28.9784]],
+      "destinations": [[41.0421, 29.2510], [41.0766, 29.0232], [40.9901, 29.0287]]
+    }
+    """
+    route_model = get_route_model()
+    if route_model is None:
+        return model_unavailable_response()
+
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "JSON body bekleniyor"}), 400
+
+    datetime_str = data.get("datetime")
+    if not datetime_str:
+        return jsonify({"error": "datetime alanı zorunlu"}), 400
+    try:
+        dt_obj = dt.datetime.fromisoformat(datetime_str)
+    except (TypeError, ValueError):
+        return jsonify({"error": "datetime formatı hatalı. Örnek: 2025-11-27T08:30"}), 400
+
+    try:
+        origin_lats, origin_lons = parse_coordinate_list(data.get("origins"), "origins")
+        dest_lats, dest_lons = parse_coordinate_list(data.get("destinations"), "destinations")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if len(origin_lats) * len(dest_lats) > MAX_MATRIX_CELLS:
+        return jsonify({"error": f"Matris en fazla {MAX_MATRIX_CELLS} hücre olabilir"}), 400
+
+    try:
+        raw_speeds = route_model.predict_matrix(
+            origin_lats, origin_lons, dest_lats, dest_lons,
+            dt_obj.hour, dt_obj.weekday(), dt_obj.month,
+            max_cells=MATRIX_CHUNK_CELLS
+        )
+    except Exception as e:
+        print(f">> Matris tahmin hatası: {e}")
+        return jsonify({"error": f"Rota model tahmin hatası: {str(e)}"}), 500
+
+    if raw_speeds is None:
+        return jsonify({"error": "Tahmin yapılamadı"}), 500
+
+    final_speeds = apply_time_factor_array(raw_speeds, dt_obj.hour)
+    distance_km = haversine_distance_array(
+        origin_lats[:, None], origin_lons[:, None], dest_lats[None, :], dest_lons[None, :]
+    )
+    estimated_minutes = distance_km / final_speeds * 60
+
+    return jsonify({
+        "speed_kmh": np.round(final_speeds, 1).tolist(),
+        "distance_km": np.round(distance_km, 2).tolist(),
+        "estimated_minutes": np.round(estimated_minutes, 1).tolist(),
+        "origins_count": len(origin_lats),
+        "destinations_count": len(dest_lats),
         "model_type": "route_based"
     }), 200
 
@@ -273,20 +905,124 @@ def predict():
 #  DATABASE ENDPOINTLERİ
 # ======================
 
+# GET /history sayfa boyutu (limit parametresi verilmezse) ve üst sınırı
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 50))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv('HISTORY_MAX_PAGE_SIZE', 200))
+
+# Yanıtta kullanılan kolonlar; tam ORM nesnesi yerine sadece bunlar okunur
+HISTORY_COLUMNS = (
+    SearchHistory.id, SearchHistory.origin, SearchHistory.destination, SearchHistory.datetime,
+    SearchHistory.traffic_level, SearchHistory.traffic_label, SearchHistory.speed_kmh,
+    SearchHistory.estimated_minutes, SearchHistory.distance_km, SearchHistory.created_at
+)
+
+
+# POST /history doğrulaması
+HISTORY_TEXT_FIELDS = ("origin", "destination", "traffic_label")
+HISTORY_NUMERIC_FIELDS = ("origin_lat", "origin_lon", "destination_lat", "destination_lon",
+                          "speed_kmh", "estimated_minutes", "distance_km")
+
+
+def encode_history_cursor(created_at, history_id):
+    """Sayfanın son satırının (created_at, id) anahtarını opak bir metne çevirir"""
+    payload = json.dumps([created_at.isoformat() if created_at else None, history_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_history_cursor(cursor):
+    """encode_history_cursor'un tersi; geçersiz cursor için ValueError fırlatır"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, history_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = dt.datetime.fromisoformat(created_at) if created_at is not None else None
+        if not isinstance(history_id, int):
+            raise ValueError
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError("cursor geçersiz")
+    return created_at, history_id
+
+
+def fetch_history_page(db, user_id, after, count):
+    """(created_at DESC, id DESC) sırasında after=(created_at, id) anahtarından sonraki count satırı okur.
+
+    "created_at <= c AND (created_at < c OR id < i)" biçimi (user_id, created_at)
+    indeksinde doğrudan c'den başlayan bir aralık taramasıdır. created_at NULL
+    satırlar (MySQL ve SQLite'ta) DESC sırasının sonundadır; aralık bittiğinde
+    sayfa bu satırlardan ayrı bir sorguyla tamamlanır.
+    """
+    def page(*conditions):
+        return db.query(*HISTORY_COLUMNS).filter(SearchHistory.user_id == user_id, *conditions).order_by(
+            SearchHistory.created_at.desc(), SearchHistory.id.desc()
+        )
+
+    if after is None:
+        return page().limit(count).all()
+    created_at, history_id = after
+    if created_at is None:
+        return page(SearchHistory.created_at.is_(None), SearchHistory.id < history_id).limit(count).all()
+
+    rows = page(
+        SearchHistory.created_at <= created_at,
+        or_(SearchHistory.created_at < created_at, SearchHistory.id < history_id)
+    ).limit(count).all()
+    if len(rows) < count:
+        rows += page(SearchHistory.created_at.is_(None)).limit(count - len(rows)).all()
+    return rows
+
+
+def cached_json_response(etag, body):
+    """Önbellekteki JSON gövdesini ETag ile döndürür; If-None-Match eşleşirse 304 döner.
+
+    no-cache: tarayıcı yanıtı saklar ama her seferinde ETag ile doğrular.
+    """
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
+
 @app.route("/history", methods=["GET"])
 def get_history():
-    """Kullanıcının arama geçmişini döndürür"""
+    """Kullanıcının arama geçmişini en yeniden eskiye, sayfa sayfa döndürür.
+
+    limit: sayfa boyutu (varsayılan HISTORY_PAGE_SIZE, en fazla HISTORY_MAX_PAGE_SIZE)
+    cursor: önceki yanıttaki next_cursor; yoksa ilk sayfa döner. Sayfalama
+    (created_at, id) anahtarıyla yapılır (keyset), derin sayfalar da indeksten
+    ilk sayfa kadar hızlı okunur. Son sayfada next_cursor null'dır.
+
+    Yanıt kullanıcının geçmişi değişene kadar önbellekten (veritabanına
+    gidilmeden) döner; If-None-Match ETag'le eşleşirse 304 döner.
+    """
     user_id = request.args.get("user_id", type=int)
     if not user_id:
         return jsonify({"error": "user_id parametresi gerekli"}), 400
+
+    limit = request.args.get("limit", HISTORY_PAGE_SIZE, type=int)
+    if limit < 1:
+        return jsonify({"error": "limit en az 1 olmalı"}), 400
+    limit = min(limit, HISTORY_MAX_PAGE_SIZE)
+
+    cursor = request.args.get("cursor")
+    try:
+        after = decode_history_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    cached, version = response_cache.lookup("history", user_id, (limit, cursor))
+    if cached is not None:
+        return cached_json_response(*cached)
     
     try:
         with get_db_session() as db:
-            history = db.query(SearchHistory).filter(
-                SearchHistory.user_id == user_id
-            ).order_by(SearchHistory.created_at.desc()).limit(50).all()
+            # Bir fazla satır okunur: varsa sonraki sayfa vardır
+            rows = fetch_history_page(db, user_id, after, limit + 1)
+            history = rows[:limit]
+            next_cursor = None
+            if len(rows) > limit:
+                next_cursor = encode_history_cursor(history[-1].created_at, history[-1].id)
             
-            return jsonify({
+            body = jsonify({
+                "next_cursor": next_cursor,
                 "history": [{
                     "id": h.id,
                     "origin": h.origin,
@@ -299,12 +1035,25 @@ def get_history():
                     "distance_km": h.distance_km,
                     "created_at": h.created_at.isoformat() if h.created_at else None
                 } for h in history]
-            }), 200
+            }).get_data()
+        return cached_json_response(*response_cache.store("history", user_id, (limit, cursor), version, body))
     except Exception as e:
         print(f">> History getirme hatası: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+def validate_history_row(row):
+    """Kolon tiplerine ve uzunluklarına uymayan alan varsa hata mesajını, yoksa None döndürür"""
+    for field in HISTORY_TEXT_FIELDS:
+        max_length = SearchHistory.__table__.c[field].type.length
+        if not isinstance(row[field], str) or len(row[field]) > max_length:
+            return f"{field} en fazla {max_length} karakterlik metin olmalı"
+    for field in HISTORY_NUMERIC_FIELDS:
+        if not math.isfinite(row[field]):
+            return "Sayısal alanlardan biri hatalı"
+    return None
+
+
 @app.route("/history", methods=["POST"])
 def save_history():
     """Yeni arama geçmişi kaydeder"""
@@ -324,44 +1073,66 @@ def save_history():
         datetime_obj = dt.datetime.fromisoformat(data["datetime"])
     except ValueError:
         return jsonify({"error": "datetime formatı hatalı"}), 400
+
+    try:
+        row = {
+            "user_id": int(data["user_id"]),
+            "origin": data["origin"],
+            "destination": data["destination"],
+            "origin_lat": float(data["origin_lat"]),
+            "origin_lon": float(data["origin_lon"]),
+            "destination_lat": float(data["destination_lat"]),
+            "destination_lon": float(data["destination_lon"]),
+            "datetime": datetime_obj,
+            "traffic_level": int(data["traffic_level"]),
+            "traffic_label": data["traffic_label"],
+            "speed_kmh": float(data["speed_kmh"]),
+            "estimated_minutes": float(data["estimated_minutes"]),
+            "distance_km": float(data["distance_km"])
+        }
+    except (TypeError, ValueError):
+        return jsonify({"error": "Sayısal alanlardan biri hatalı"}), 400
+
+    # Write-behind'da hatalı kayıt aynı gruptaki diğer kayıtların yazılmasını
+    # engellemesin: tip ve uzunluk kuyruğa eklemeden önce kontrol edilir
+    error = validate_history_row(row)
+    if error:
+        return jsonify({"error": error}), 400
+
+    if HISTORY_WRITE_BEHIND:
+        # Kayıt zamanı istek anıdır, yazıcının gruplayıp eklediği an değil
+        row["created_at"] = dt.datetime.now(dt.timezone.utc)
+        if not history_writer.enqueue(row):
+            response = jsonify({"error": "Geçmiş kuyruğu dolu, lütfen tekrar deneyin"})
+            response.headers["Retry-After"] = "1"
+            return response, 503
+        return jsonify({"message": "Arama geçmişi kaydı kuyruğa alındı", "queued": True}), 202
     
     try:
         with get_db_session() as db:
             # User var mı kontrol et, yoksa oluştur
-            user = db.query(User).filter(User.id == data["user_id"]).first()
+            user = db.query(User).filter(User.id == row["user_id"]).first()
             if not user:
                 # Demo mod: User yoksa otomatik oluştur
                 # Email olarak user_id kullan (demo için)
                 user = User(
-                    id=data["user_id"],
-                    email=f"user_{data['user_id']}@demo.com",
+                    id=row["user_id"],
+                    email=f"user_{row['user_id']}@demo.com",
                     password_hash="demo"  # Demo mod, gerçek şifre yok
                 )
                 db.add(user)
                 db.flush()
             
-            history_entry = SearchHistory(
-                user_id=data["user_id"],
-                origin=data["origin"],
-                destination=data["destination"],
-                origin_lat=float(data["origin_lat"]),
-                origin_lon=float(data["origin_lon"]),
-                destination_lat=float(data["destination_lat"]),
-                destination_lon=float(data["destination_lon"]),
-                datetime=datetime_obj,
-                traffic_level=int(data["traffic_level"]),
-                traffic_label=data["traffic_label"],
-                speed_kmh=float(data["speed_kmh"]),
-                estimated_minutes=float(data["estimated_minutes"]),
-                distance_km=float(data["distance_km"])
-            )
+            history_entry = SearchHistory(**row)
             db.add(history_entry)
             db.flush()
-            
-            return jsonify({
-                "id": history_entry.id,
-                "message": "Arama geçmişi kaydedildi"
-            }), 201
+            history_id = history_entry.id
+        # Önbellek commit'ten sonra geçersiz kılınır
+        response_cache.invalidate("history", row["user_id"])
+        return jsonify({
+            "id": history_id,
+            "message": "Arama geçmişi kaydedildi"
+        }), 201
     except Exception as e:
         print(f">> History kaydetme hatası: {e}")
         return jsonify({"error": str(e)}), 500
@@ -385,8 +1156,8 @@ def delete_history(history_id):
                 return jsonify({"error": "Arama geçmişi kaydı bulunamadı"}), 404
             
             db.delete(history_entry)
-            
-            return jsonify({"message": "Arama geçmişi kaydı silindi"}), 200
+        response_cache.invalidate("history", user_id)
+        return jsonify({"message": "Arama geçmişi kaydı silindi"}), 200
     except Exception as e:
         print(f">> History silme hatası: {e}")
         return jsonify({"error": str(e)}), 500
@@ -394,10 +1165,14 @@ def delete_history(history_id):
 
 @app.route("/favorites", methods=["GET"])
 def get_favorites():
-    """Kullanıcının favorilerini döndürür"""
+    """Kullanıcının favorilerini döndürür (değişmediyse önbellekten, ETag/304 destekli)"""
     user_id = request.args.get("user_id", type=int)
     if not user_id:
         return jsonify({"error": "user_id parametresi gerekli"}), 400
+
+    cached, version = response_cache.lookup("favorites", user_id)
+    if cached is not None:
+        return cached_json_response(*cached)
     
     try:
         with get_db_session() as db:
@@ -405,7 +1180,7 @@ def get_favorites():
                 Favorite.user_id == user_id
             ).order_by(Favorite.created_at.desc()).all()
             
-            return jsonify({
+            body = jsonify({
                 "favorites": [{
                     "id": f.id,
                     "origin": f.origin,
@@ -417,12 +1192,23 @@ def get_favorites():
                     "name": f.name,
                     "created_at": f.created_at.isoformat() if f.created_at else None
                 } for f in favorites]
-            }), 200
+            }).get_data()
+        return cached_json_response(*response_cache.store("favorites", user_id, None, version, body))
     except Exception as e:
         print(f">> Favorites getirme hatası: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+def is_duplicate_favorite_error(error):
+    """IntegrityError uq_favorites_user_route_key ihlalinden mi kaynaklanıyor?
+
+    MySQL ve PostgreSQL mesajda indeks adını, SQLite kolonları verir.
+    """
+    message = str(error.orig)
+    return ('uq_favorites_user_route_key' in message
+            or 'favorites.user_id, favorites.route_key' in message)
+
+
 @app.route("/favorites", methods=["POST"])
 def add_favorite():
     """Yeni favori ekler"""
@@ -451,11 +1237,11 @@ def add_favorite():
                 db.add(user)
                 db.flush()
             
-            # Aynı favori var mı kontrol et
+            # Aynı favori var mı kontrol et (benzersiz indeksle aynı anahtar)
+            route_key = favorite_route_key(data["origin"], data["destination"])
             existing = db.query(Favorite).filter(
                 Favorite.user_id == data["user_id"],
-                Favorite.origin == data["origin"],
-                Favorite.destination == data["destination"]
+                Favorite.route_key == route_key
             ).first()
             
             if existing:
@@ -465,6 +1251,7 @@ def add_favorite():
                 user_id=data["user_id"],
                 origin=data["origin"],
                 destination=data["destination"],
+                route_key=route_key,
                 origin_lat=float(data["origin_lat"]),
                 origin_lon=float(data["origin_lon"]),
                 destination_lat=float(data["destination_lat"]),
@@ -473,11 +1260,19 @@ def add_favorite():
             )
             db.add(favorite)
             db.flush()
-            
-            return jsonify({
-                "id": favorite.id,
-                "message": "Favori eklendi"
-            }), 201
+            favorite_id = favorite.id
+        response_cache.invalidate("favorites", int(data["user_id"]))
+        return jsonify({
+            "id": favorite_id,
+            "message": "Favori eklendi"
+        }), 201
+    except IntegrityError as e:
+        # Eşzamanlı aynı istek: benzersiz indeks (uq_favorites_user_route_key) ikinciyi reddeder.
+        # Diğer ihlaller (ör. demo kullanıcının id/e-posta çakışması) genel hata olarak döner.
+        if is_duplicate_favorite_error(e):
+            return jsonify({"error": "Bu favori zaten mevcut"}), 400
+        print(f">> Favorite ekleme hatası: {e}")
+        return jsonify({"error": str(e)}), 500
     except Exception as e:
         print(f">> Favorite ekleme hatası: {e}")
         return jsonify({"error": str(e)}), 500
@@ -501,8 +1296,8 @@ def delete_favorite(favorite_id):
                 return jsonify({"error": "Favori bulunamadı"}), 404
             
             db.delete(favorite)
-            
-            return jsonify({"message": "Favori silindi"}), 200
+        response_cache.invalidate("favorites", user_id)
+        return jsonify({"message": "Favori silindi"}), 200
     except Exception as e:
         print(f">> Favorite silme hatası: {e}")
         return jsonify({"error": str(e)}), 500
@@ -512,13 +1307,15 @@ def delete_favorite(favorite_id):
 #  MAIN
 # ======================
 if __name__ == "__main__":
-    import os
     port = int(os.getenv('PORT', 5001))
     print(">> Flask uygulaması başlatılıyor...")
     print(">> Authentication: POST /register, POST /login")
-    print(">> Rota bazlı model: /predict")
-    print(">> Health check: /health")
+    print(">> Rota bazlı model: /predict, POST /predict/batch, POST /predict/departures,")
+    print(">>                  POST /predict/matrix, POST /predict/segments")
+    print(">> Health check: /health, hazırlık: /ready, metrikler: /metrics")
+    print(">> Model yenileme: POST /admin/reload-model")
     print(">> History: GET/POST /history, DELETE /history/<id>")
     print(">> Favorites: GET/POST /favorites, DELETE /favorites/<id>")
+    start_background_tasks()
     app.run(host="0.0.0.0", port=port, debug=False)
 
@@ -0,0 +1,273 @@
+"""
+search_history / favorites indeks benchmark'ı
+
+Tabloları indeks migrasyonları öncesi şemayla (sadece birincil anahtarlar) kurar,
+sentetik kullanıcı geçmişi ve favorilerle doldurur, ardından uygulamanın
+çalıştırdığı üç sorgunun planını (EXPLAIN) ve gecikmesini ölçer:
+
+    history_list     GET /history: user_id filtresi, created_at DESC, LIMIT 50
+    favorites_list   GET /favorites: user_id filtresi, created_at DESC
+    favorite_exists  POST /favorites tekrar kontrolü: (user_id, route_key)
+
+Sonra migrations.run_migrations() ile indeksler eklenir ve aynı ölçümler
+tekrarlanır. Varsayılan veritabanı geçici bir SQLite dosyasıdır; --database-url
+ile MySQL ölçülebilir. DİKKAT: verilen veritabanındaki users, search_history,
+favorites ve schema_migrations tabloları silinip yeniden oluşturulur.
+
+Kullanım (backend dizininden):
+    python benchmarks/db_index_bench.py --output indeks.json
+    python benchmarks/db_index_bench.py --database-url mysql+pymysql://root@localhost/trafik_bench
+"""
+import argparse
+import contextlib
+import datetime as dt
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from synthetic import BACKEND_DIR
+
+# Migrasyon 0001 ve 0002'nin eklediği indeksler
+NEW_INDEXES = {'ix_search_history_user_created', 'ix_favorites_user_created', 'uq_favorites_user_route_key'}
+
+
+def explain(conn, statement):
+    """Sorgunun veritabanı planını satır listesi olarak döndürür"""
+    from sqlalchemy import text
+
+    sql = str(statement.compile(conn, compile_kwargs={'literal_binds': True}))
+    prefix = 'EXPLAIN QUERY PLAN' if conn.dialect.name == 'sqlite' else 'EXPLAIN'
+    rows = conn.execute(text(f"{prefix} {sql}")).mappings().all()
+    return [{key: value for key, value in row.items() if value is not None} for row in rows]
+
+
+def build_queries(users, favorites_by_user, rng):
+    """Ölçülecek sorguları (ad -> ifade üreten fonksiyon) döndürür"""
+    from sqlalchemy import select
+    from database import Favorite, SearchHistory, favorite_route_key
+
+    def history_list():
+        user_id = rng.choice(users)
+        return (select(SearchHistory).where(SearchHistory.user_id == user_id)
+                .order_by(SearchHistory.created_at.desc()).limit(50))
+
+    def favorites_list():
+        user_id = rng.choice(users)
+        return select(Favorite).where(Favorite.user_id == user_id).order_by(Favorite.created_at.desc())
+
+    def favorite_exists():
+        user_id = rng.choice(users)
+        origin, destination = rng.choice(favorites_by_user[user_id])
+        return select(Favorite).where(
+            Favorite.user_id == user_id, Favorite.route_key == favorite_route_key(origin, destination)
+        ).limit(1)
+
+    return {'history_list': history_list, 'favorites_list': favorites_list, 'favorite_exists': favorite_exists}
+
+
+def measure(engine, queries, repeat):
+    """Her sorgu için plan ve gecikme (ms) istatistikleri"""
+    results = {}
+    with engine.connect() as conn:
+        for name, make in queries.items():
+            plan = explain(conn, make())
+            for _ in range(min(20, repeat)):
+                conn.execute(make()).all()
+            samples = []
+            for _ in range(repeat):
+                statement = make()
+                started = time.perf_counter()
+                conn.execute(statement).all()
+                samples.append(time.perf_counter() - started)
+            latencies = np.array(samples) * 1000
+            p50, p95 = np.percentile(latencies, [50, 95])
+            results[name] = {
+                'plan': plan,
+                'latency_ms': {
+                    'mean': round(float(latencies.mean()), 3),
+                    'p50': round(float(p50), 3),
+                    'p95': round(float(p95), 3)
+                }
+            }
+    return results
+
+
+def populate(engine, n_users, history_per_user, favorites_per_user, seed, batch_size=5000):
+    """Kullanıcı, geçmiş ve favori satırlarını toplu ekler; kullanıcı id'leri ve favori rotalarını döndürür"""
+    from database import Favorite, SearchHistory, User
+
+    rng = random.Random(seed)
+    now = dt.datetime(2025, 1, 1)
+    users = list(range(1, n_users + 1))
+    favorites_by_user = {}
+
+    def insert(conn, table, rows):
+        for start in range(0, len(rows), batch_size):
+            conn.execute(table.insert(), rows[start:start + batch_size])
+
+    with engine.begin() as conn:
+        insert(conn, User.__table__, [
+            {'id': user_id, 'email': f"bench-{user_id}@example.com", 'password_hash': 'x', 'created_at': now}
+            for user_id in users
+        ])
+        # Satırlar gerçek kullanımdaki gibi kullanıcılar arasında zamana göre karışık eklenir
+        history = []
+        for i in range(n_users * history_per_user):
+            created = now - dt.timedelta(seconds=n_users * history_per_user - i)
+            history.append({
+                'user_id': rng.choice(users), 'origin': f"Başlangıç {rng.randint(1, 5000)}",
+                'destination': f"Varış {rng.randint(1, 5000)}", 'origin_lat': 41.0, 'origin_lon': 29.0,
+                'destination_lat': 41.1, 'destination_lon': 29.1, 'datetime': created, 'traffic_level': 1,
+                'traffic_label': 'Orta', 'speed_kmh': 42.0, 'estimated_minutes': 12.0, 'distance_km': 8.4,
+                'created_at': created
+            })
+            if len(history) >= batch_size:
+                insert(conn, SearchHistory.__table__, history)
+                history = []
+        insert(conn, SearchHistory.__table__, history)
+
+        favorites = []
+        for user_id in users:
+            routes = [(f"Başlangıç {user_id}-{j}", f"Varış {user_id}-{j}") for j in range(favorites_per_user)]
+            favorites_by_user[user_id] = routes
+            for j, (origin, destination) in enumerate(routes):
+                favorites.append({
+                    'user_id': user_id, 'origin': origin, 'destination': destination,
+                    'origin_lat': 41.0, 'origin_lon': 29.0, 'destination_lat': 41.1, 'destination_lon': 29.1,
+                    'name': None, 'created_at': now - dt.timedelta(minutes=j)
+                })
+        insert(conn, Favorite.__table__, favorites)
+    return users, favorites_by_user
+
+
+def reset_schema(engine):
+    """Tabloları silip indeks migrasyonları öncesi şemayla (yeni indeksler olmadan) yeniden oluşturur"""
+    from sqlalchemy import MetaData
+    from database import Base
+    from migrations import schema_migrations
+
+    schema_migrations.drop(engine, checkfirst=True)
+    Base.metadata.drop_all(engine)
+    # Tablolar yeni indeksler çıkarılmış bir kopyadan kurulur; MySQL'de user_id
+    # yabancı anahtarı için otomatik indeks eski şemadaki gibi oluşur
+    legacy = MetaData()
+    for table in Base.metadata.sorted_tables:
+        copy = table.to_metadata(legacy)
+        for index in list(copy.indexes):
+            if index.name in NEW_INDEXES:
+                copy.indexes.discard(index)
+    legacy.create_all(engine)
+
+
+def table_rows(engine):
+    from sqlalchemy import func, select
+    from database import Favorite, SearchHistory, User
+
+    with engine.connect() as conn:
+        return {model.__tablename__: conn.execute(select(func.count()).select_from(model)).scalar()
+                for model in (User, SearchHistory, Favorite)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="search_history/favorites indeks benchmark'ı (EXPLAIN + gecikme)")
+    parser.add_argument('--database-url', help="Ölçülecek veritabanı (tablolar silinir!). Varsayılan: geçici SQLite")
+    parser.add_argument('--users', type=int, default=2000, help="Kullanıcı sayısı (varsayılan: 2000)")
+    parser.add_argument('--history-per-user', type=int, default=250, help="Kullanıcı başına geçmiş (varsayılan: 250)")
+    parser.add_argument('--favorites-per-user', type=int, default=20, help="Kullanıcı başına favori (varsayılan: 20)")
+    parser.add_argument('--repeat', type=int, default=200, help="Sorgu başına ölçüm sayısı (varsayılan: 200)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Sonuç JSON dosyası (varsayılan: stdout)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        workdir = tempfile.mkdtemp(prefix='trafik-db-bench-')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.pop('MYSQL_URL', None)
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+    from database import engine
+    from migrations import run_migrations
+
+    try:
+        reset_schema(engine)
+        print("📥 Veri ekleniyor...", file=sys.stderr)
+        started = time.perf_counter()
+        users, favorites_by_user = populate(
+            engine, args.users, args.history_per_user, args.favorites_per_user, args.seed
+        )
+        populate_seconds = time.perf_counter() - started
+
+        print("📏 İndeksler olmadan ölçülüyor...", file=sys.stderr)
+        before = measure(engine, build_queries(users, favorites_by_user, random.Random(args.seed)), args.repeat)
+
+        started = time.perf_counter()
+        # run_migrations ilerlemeyi stdout'a yazar; JSON çıktısı bozulmasın
+        with contextlib.redirect_stdout(sys.stderr):
+            applied = run_migrations(engine)
+        migration_seconds = time.perf_counter() - started
+
+        print("📏 İndekslerle ölçülüyor...", file=sys.stderr)
+        after = measure(engine, build_queries(users, favorites_by_user, random.Random(args.seed)), args.repeat)
+        rows = table_rows(engine)
+    finally:
+        engine.dispose()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'benchmark': 'db_indexes',
+        'schema_version': 1,
+        'started_at': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'dialect': engine.dialect.name,
+            'server_version': '.'.join(map(str, engine.dialect.server_version_info or ())) or None,
+            'platform': platform.platform()
+        },
+        'rows': rows,
+        'populate_seconds': round(populate_seconds, 2),
+        'migrations': {'applied': applied, 'seconds': round(migration_seconds, 2)},
+        'before': before,
+        'after': after,
+        'speedup_p50': {
+            name: round(before[name]['latency_ms']['p50'] / max(after[name]['latency_ms']['p50'], 1e-6), 1)
+            for name in before
+        }
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"💾 Sonuçlar '{args.output}' dosyasına yazıldı.", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+TrafficModel çıkarım mikro benchmark'ı
+
+Her model varyantı ayrı bir alt süreçte ölçülür (yükleme süresi ve tepe
+bellek birbirini etkilemesin):
+
+    sklearn        pickle + sklearn predict (derlenmiş orman kapalı)
+    compiled       varsayılan servis: <=512 satır derlenmiş orman, üstü sklearn
+    pickle_mmap    MODEL_MMAP=1, derlenmiş dosya yokken (pickle mmap_mode='r')
+    compiled_mmap  MODEL_MMAP=1 (yalnızca derlenmiş orman, bellek eşlemeli)
+    grid           MODEL_MODE=grid (önceden hesaplanmış hız grid'i)
+
+Gruplar (varsayılan 1, 10, 100, 10000 satır) predict_features ile, tek rota
+ayrıca /predict'in kullandığı predict_route ile ölçülür. Sonuç anahtarları
+sıralı JSON'dur; model yeniden eğitildikçe çıktılar karşılaştırılabilir.
+
+Kullanım (backend dizininden):
+    python benchmarks/inference_bench.py                      # sentetik 100 ağaçlı model
+    python benchmarks/inference_bench.py --model active       # models/CURRENT'taki model
+    python benchmarks/inference_bench.py --model trafik_modeli.pkl --variants sklearn compiled
+"""
+import argparse
+import contextlib
+import datetime as dt
+import hashlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from synthetic import BACKEND_DIR, random_routes, train_synthetic_model
+
+VARIANTS = ['sklearn', 'compiled', 'pickle_mmap', 'compiled_mmap', 'grid']
+DEFAULT_BATCH_SIZES = [1, 10, 100, 10000]
+
+
+def peak_rss_mb():
+    """Sürecin tepe RSS'i (MB).
+
+    Linux'ta ru_maxrss exec'ten önceki (fork edilen ana süreçteki) değeri
+    taşıyabildiği için /proc/self/status içindeki VmHWM tercih edilir.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # ru_maxrss Linux'ta KB, macOS'ta bayt cinsindendir
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20, 1)
+    except (OSError, ValueError):
+        return None
+
+
+def latency_stats(samples, rows):
+    samples = np.asarray(samples) * 1000
+    p50, p95 = np.percentile(samples, [50, 95])
+    return {
+        'repeats': len(samples),
+        'mean_ms': round(float(samples.mean()), 4),
+        'p50_ms': round(float(p50), 4),
+        'p95_ms': round(float(p95), 4),
+        'min_ms': round(float(samples.min()), 4),
+        'rows_per_sec': round(rows / (float(p50) / 1000), 1) if p50 > 0 else None
+    }
+
+
+def repeats_for(rows, scale):
+    """Küçük gruplar daha çok tekrarlanır (her boyut için ~aynı toplam satır)"""
+    return max(3, int(scale * min(500, 20000 // rows)))
+
+
+# ----------------------
+#  Alt süreç: tek varyantın ölçümü
+# ----------------------
+def measure_variant(variant, model_path, batch_sizes, scale, seed):
+    from model_loader import TrafficModel
+
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        model = TrafficModel(
+            model_path,
+            mode='grid' if variant == 'grid' else 'forest',
+            mmap=variant in ('pickle_mmap', 'compiled_mmap')
+        )
+    load_seconds = time.perf_counter() - started
+    if model.model is None:
+        raise RuntimeError(f"Model yüklenemedi: {model_path}")
+    if variant == 'sklearn':
+        model.compiled = None
+    if variant == 'grid' and model.grid is None:
+        raise RuntimeError("Grid dosyası bulunamadı")
+    rss_after_load = current_rss_mb()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        model.warm_up()
+
+    start_lats, start_lons, end_lats, end_lons, times = random_routes(max(batch_sizes), seed=seed)
+    hours = np.array([t.hour for t in times])
+    days = np.array([t.weekday() for t in times])
+    months = np.array([t.month for t in times])
+
+    batches = {}
+    for rows in batch_sizes:
+        args = (start_lats[:rows], start_lons[:rows], end_lats[:rows], end_lons[:rows],
+                hours[:rows], days[:rows], months[:rows])
+        model.predict_features(*args)
+        samples = []
+        for _ in range(repeats_for(rows, scale)):
+            t0 = time.perf_counter()
+            model.predict_features(*args)
+            samples.append(time.perf_counter() - t0)
+        batches[str(rows)] = latency_stats(samples, rows)
+
+    samples = []
+    for i in range(repeats_for(1, scale)):
+        j = i % len(start_lats)
+        t0 = time.perf_counter()
+        model.predict_route(start_lats[j], start_lons[j], end_lats[j], end_lons[j], times[j])
+        samples.append(time.perf_counter() - t0)
+
+    return {
+        'load_seconds': round(load_seconds, 4),
+        'serving_mode': model.serving_mode,
+        'memory_mb': {
+            'rss_before_load': rss_before,
+            'rss_after_load': rss_after_load,
+            'rss_end': current_rss_mb(),
+            'peak_rss': peak_rss_mb()
+        },
+        'predict_route': latency_stats(samples, 1),
+        'predict_features': batches
+    }
+
+
+# ----------------------
+#  Ana süreç
+# ----------------------
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def resolve_model(args, workdir):
+    """Ölçülecek pickle yolunu ve model bilgisini döndürür"""
+    if args.model is None:
+        print(f"⏳ Sentetik model eğitiliyor ({args.n_estimators} ağaç)...", file=sys.stderr)
+        with contextlib.redirect_stdout(sys.stderr):
+            _, model_path = train_synthetic_model(
+                os.path.join(workdir, 'models'), n_estimators=args.n_estimators, seed=args.seed
+            )
+        return model_path, {'source': 'synthetic', 'n_estimators': args.n_estimators}
+    if args.model == 'active':
+        from model_registry import ModelRegistry, MODEL_FILENAME
+        registry = ModelRegistry(os.path.join(BACKEND_DIR, 'models'),
+                                 legacy_path=os.path.join(BACKEND_DIR, MODEL_FILENAME))
+        version = registry.active_version()
+        return registry.model_path(version), {'source': 'registry', 'version': version}
+    return os.path.abspath(args.model), {'source': 'file'}
+
+
+def prepare_variant_paths(model_path, variants, workdir, grid_size):
+    """Her varyantın yükleyeceği pickle yolunu hazırlar.
+
+    pickle_mmap için derlenmiş dosyası olmayan, grid için grid dosyası olan
+    ayrı bir dizine bağlantı oluşturulur; asıl model dizinine dokunulmaz.
+    """
+    from model_loader import compiled_path_for, grid_paths_for
+
+    paths = {}
+    for variant in variants:
+        if variant == 'pickle_mmap':
+            target = os.path.join(workdir, 'pickle_only', os.path.basename(model_path))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if not os.path.exists(target):
+                os.symlink(model_path, target)
+            paths[variant] = target
+        elif variant == 'grid':
+            npy_path, _ = grid_paths_for(model_path)
+            if os.path.exists(npy_path):
+                paths[variant] = model_path
+                continue
+            target_dir = os.path.join(workdir, 'grid')
+            target = os.path.join(target_dir, os.path.basename(model_path))
+            os.makedirs(target_dir, exist_ok=True)
+            if not os.path.exists(target):
+                os.symlink(model_path, target)
+                compiled = compiled_path_for(model_path)
+                if os.path.exists(compiled):
+                    os.symlink(compiled, compiled_path_for(target))
+            print(f"⏳ Hız grid'i oluşturuluyor ({grid_size[0]}x{grid_size[1]})...", file=sys.stderr)
+            from train_model import build_speed_grid
+            with contextlib.redirect_stdout(sys.stderr):
+                build_speed_grid(target, n_lat=grid_size[0], n_lon=grid_size[1])
+            paths[variant] = target
+        else:
+            if variant in ('compiled', 'compiled_mmap') and not os.path.exists(compiled_path_for(model_path)):
+                print(f"⚠️ Derlenmiş dosya yok, '{variant}' sklearn'e düşecek: "
+                      f"'train_model.py --compile-only' çalıştırın.", file=sys.stderr)
+            paths[variant] = model_path
+    return paths
+
+
+def run_child(variant, model_path, args):
+    cmd = [
+        sys.executable, os.path.abspath(__file__), '--child', variant,
+        '--child-model', model_path, '--seed', str(args.seed),
+        '--repeat-scale', str(args.repeat_scale),
+        '--batch-sizes', *[str(size) for size in args.batch_sizes]
+    ]
+    proc = subprocess.run(cmd, cwd=BACKEND_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'bilinmeyen hata'}
+    return json.loads(proc.stdout)
+
+
+def package_version(name):
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="TrafficModel çıkarım mikro benchmark'ı")
+    parser.add_argument('--model', help="Pickle yolu ya da 'active' (varsayılan: sentetik model eğitilir)")
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=VARIANTS)
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=DEFAULT_BATCH_SIZES)
+    parser.add_argument('--repeat-scale', type=float, default=1.0,
+                        help="Tekrar sayısı çarpanı (hızlı deneme için <1)")
+    parser.add_argument('--n-estimators', type=int, default=100, help="Sentetik modeldeki ağaç sayısı")
+    parser.add_argument('--grid-size', type=int, nargs=2, default=[4, 4], metavar=('N_LAT', 'N_LON'),
+                        help="Model yanında grid yoksa benchmark için üretilecek grid boyutu")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Sonuç JSON dosyası (varsayılan: stdout)")
+    parser.add_argument('--child', choices=VARIANTS, help=argparse.SUPPRESS)
+    parser.add_argument('--child-model', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        result = measure_variant(args.child, args.child_model, args.batch_sizes, args.repeat_scale, args.seed)
+        print(json.dumps(result))
+        return
+
+    workdir = tempfile.mkdtemp(prefix='trafik-inference-')
+    try:
+        model_path, model_info = resolve_model(args, workdir)
+        if not os.path.exists(model_path):
+            sys.exit(f"❌ Model dosyası bulunamadı: {model_path}")
+        model_info.update({
+            'path': model_path,
+            'size_mb': round(os.path.getsize(model_path) / 2 ** 20, 1),
+            'sha256_16': file_sha256(model_path)
+        })
+        paths = prepare_variant_paths(model_path, args.variants, workdir, args.grid_size)
+
+        variants = {}
+        for variant in args.variants:
+            print(f"📏 {variant} ölçülüyor...", file=sys.stderr)
+            variants[variant] = run_child(variant, paths[variant], args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'benchmark': 'inference',
+        'schema_version': 1,
+        'started_at': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scikit_learn': package_version('scikit-learn'),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'model': model_info,
+        'batch_sizes': args.batch_sizes,
+        'variants': variants
+    }
+    text = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"💾 Sonuçlar '{args.output}' dosyasına yazıldı.", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
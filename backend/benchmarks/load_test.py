@@ -0,0 +1,424 @@
+"""
+HTTP API yük testi (SQLite + sentetik model)
+
+Geçici bir dizinde sentetik model eğitir, sunucuyu SQLite veritabanıyla
+başlatır, test kullanıcılarını oluşturur ve karışık bir iş yükünü belirtilen
+eşzamanlılıkla çalıştırır. Endpoint başına istek/sn ve p50/p95/p99 JSON olarak
+yazılır; farklı çalıştırmalar bu dosyalar üzerinden karşılaştırılabilir.
+
+Kullanım (backend dizininden):
+    python benchmarks/load_test.py --concurrency 8 --duration 20 --output sonuc.json
+    python benchmarks/load_test.py --server development --mix predict=80,history_get=20
+    python benchmarks/load_test.py --url http://localhost:5001   # çalışan sunucuya karşı
+"""
+import argparse
+import contextlib
+import datetime as dt
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+from synthetic import BACKEND_DIR, ISTANBUL_BBOX, train_synthetic_model
+
+DEFAULT_MIX = 'predict=50,history_get=20,history_post=10,favorites_get=12,favorites_post=5,login=1'
+BENCH_PASSWORD = 'bench-password'
+
+
+# ----------------------
+#  HTTP istemcisi
+# ----------------------
+class Client:
+    """Thread başına kalıcı (keep-alive) HTTP bağlantısı"""
+
+    def __init__(self, base_url, timeout=30):
+        parsed = urllib.parse.urlparse(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        """(durum kodu, JSON gövde) döndürür; bağlantı hatasında (0, None)"""
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                resp = self.conn.getresponse()
+                data = resp.read()
+                if resp.getheader('Connection', '').lower() == 'close':
+                    self.close()
+                try:
+                    return resp.status, json.loads(data) if data else None
+                except ValueError:
+                    return resp.status, None
+            except (http.client.HTTPException, OSError):
+                # Sunucu keep-alive bağlantısını kapatmış olabilir, bir kez yeniden dene
+                self.close()
+                if attempt == 1:
+                    return 0, None
+        return 0, None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# ----------------------
+#  İş yükü
+# ----------------------
+def random_point(rng):
+    lat_min, lon_min, lat_max, lon_max = ISTANBUL_BBOX
+    return round(rng.uniform(lat_min, lat_max), 5), round(rng.uniform(lon_min, lon_max), 5)
+
+
+def random_datetime(rng):
+    when = dt.datetime(2025, 1, 1) + dt.timedelta(minutes=rng.randrange(365 * 24 * 60))
+    return when.strftime('%Y-%m-%dT%H:%M')
+
+
+def op_predict(client, rng, user):
+    start_lat, start_lon = random_point(rng)
+    end_lat, end_lon = random_point(rng)
+    return client.request('POST', '/predict', {
+        'datetime': random_datetime(rng),
+        'start_lat': start_lat, 'start_lon': start_lon,
+        'end_lat': end_lat, 'end_lon': end_lon
+    })
+
+
+def op_history_get(client, rng, user):
+    return client.request('GET', f"/history?user_id={user['id']}")
+
+
+def history_payload(rng, user_id):
+    (o_lat, o_lon), (d_lat, d_lon) = random_point(rng), random_point(rng)
+    return {
+        'user_id': user_id,
+        'origin': f'Nokta {o_lat},{o_lon}', 'destination': f'Nokta {d_lat},{d_lon}',
+        'origin_lat': o_lat, 'origin_lon': o_lon,
+        'destination_lat': d_lat, 'destination_lon': d_lon,
+        'datetime': random_datetime(rng),
+        'traffic_level': rng.randrange(3), 'traffic_label': 'Orta',
+        'speed_kmh': round(rng.uniform(10, 90), 1),
+        'estimated_minutes': round(rng.uniform(5, 90), 1),
+        'distance_km': round(rng.uniform(1, 40), 2)
+    }
+
+
+def op_history_post(client, rng, user):
+    return client.request('POST', '/history', history_payload(rng, user['id']))
+
+
+def op_favorites_get(client, rng, user):
+    return client.request('GET', f"/favorites?user_id={user['id']}")
+
+
+def favorite_payload(rng, user_id):
+    (o_lat, o_lon), (d_lat, d_lon) = random_point(rng), random_point(rng)
+    return {
+        'user_id': user_id,
+        'origin': f'Nokta {o_lat},{o_lon}', 'destination': f'Nokta {d_lat},{d_lon}',
+        'origin_lat': o_lat, 'origin_lon': o_lon,
+        'destination_lat': d_lat, 'destination_lon': d_lon,
+        'name': f'Favori {rng.randrange(10 ** 9)}'
+    }
+
+
+def op_favorites_post(client, rng, user):
+    return client.request('POST', '/favorites', favorite_payload(rng, user['id']))
+
+
+def op_login(client, rng, user):
+    return client.request('POST', '/login', {'email': user['email'], 'password': BENCH_PASSWORD})
+
+
+OPERATIONS = {
+    'predict': op_predict,
+    'history_get': op_history_get,
+    'history_post': op_history_post,
+    'favorites_get': op_favorites_get,
+    'favorites_post': op_favorites_post,
+    'login': op_login,
+}
+
+
+def parse_mix(text):
+    """'predict=50,login=5' -> {'predict': 50.0, 'login': 5.0}"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Bilinmeyen işlem: {name} (seçenekler: {', '.join(OPERATIONS)})")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Geçersiz ağırlık: {part}")
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError("En az bir işlemin ağırlığı pozitif olmalı")
+    return mix
+
+
+# ----------------------
+#  Sunucu
+# ----------------------
+def start_server(args, workdir):
+    """serve.py'yi SQLite ve sentetik modelle başlatır, Popen ve log dosyasını döndürür"""
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'MODEL_DIR': os.path.join(workdir, 'models'),
+        'MODEL_WATCH_INTERVAL': '0',
+        'PORT': str(args.port),
+        'SERVER_MODE': args.server,
+        'WEB_CONCURRENCY': str(args.workers),
+        'GUNICORN_THREADS': str(args.threads),
+    })
+    env.pop('MYSQL_URL', None)
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    proc = subprocess.Popen(
+        [sys.executable, 'serve.py'], cwd=BACKEND_DIR, env=env,
+        stdout=log, stderr=subprocess.STDOUT, start_new_session=True
+    )
+    return proc, log
+
+
+def stop_server(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+    except ProcessLookupError:
+        pass
+
+
+def wait_until_ready(base_url, proc=None, timeout=180):
+    """/ready 200 dönene kadar bekler, başlangıç süresini döndürür"""
+    client = Client(base_url, timeout=5)
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"Sunucu beklenmedik şekilde kapandı (çıkış kodu {proc.returncode})")
+        status, _ = client.request('GET', '/ready')
+        if status == 200:
+            client.close()
+            return time.perf_counter() - started
+        client.close()
+        time.sleep(0.1)
+    raise RuntimeError(f"Sunucu {timeout} sn içinde hazır olmadı")
+
+
+def seed_users(base_url, n_users, history_per_user, favorites_per_user, seed):
+    """Test kullanıcılarını kaydeder, geçmiş ve favori ekler"""
+    client = Client(base_url)
+    rng = random.Random(seed)
+    run_id = f"{int(time.time())}-{os.getpid()}"
+    users = []
+    for i in range(n_users):
+        email = f"bench-{run_id}-{i}@example.com"
+        status, body = client.request('POST', '/register', {'email': email, 'password': BENCH_PASSWORD})
+        if status != 201:
+            raise RuntimeError(f"Kullanıcı oluşturulamadı ({status}): {body}")
+        user = {'id': body['id'], 'email': email}
+        for _ in range(history_per_user):
+            client.request('POST', '/history', history_payload(rng, user['id']))
+        for _ in range(favorites_per_user):
+            client.request('POST', '/favorites', favorite_payload(rng, user['id']))
+        users.append(user)
+    client.close()
+    return users
+
+
+# ----------------------
+#  Yük üreteci
+# ----------------------
+def run_load(base_url, users, mix, concurrency, duration, warmup, seed):
+    """Süre boyunca karışık iş yükü çalıştırır; işlem -> [(gecikme sn, durum)] döndürür"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    results = {name: [] for name in names}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(concurrency + 1)
+    state = {}
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = Client(base_url)
+        local = {name: [] for name in names}
+        start_barrier.wait()
+        while True:
+            now = time.perf_counter()
+            if now >= state['end']:
+                break
+            name = rng.choices(names, weights)[0]
+            user = rng.choice(users)
+            started = time.perf_counter()
+            status, _ = OPERATIONS[name](client, rng, user)
+            finished = time.perf_counter()
+            if started >= state['measure_from']:
+                local[name].append((finished - started, status))
+        client.close()
+        with lock:
+            for name, samples in local.items():
+                results[name].extend(samples)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    now = time.perf_counter()
+    state['measure_from'] = now + warmup
+    state['end'] = now + warmup + duration
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def summarize(samples, duration):
+    """Gecikme örneklerinden istek/sn ve yüzdelikleri (ms) hesaplar"""
+    if not samples:
+        return {'requests': 0, 'errors': 0, 'rps': 0.0, 'status_codes': {}, 'latency_ms': None}
+    latencies = np.array([latency for latency, _ in samples]) * 1000
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(count for status, count in statuses.items() if status == '0' or int(status) >= 400)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'rps': round(len(samples) / duration, 2),
+        'status_codes': statuses,
+        'latency_ms': {
+            'mean': round(float(latencies.mean()), 3),
+            'p50': round(float(p50), 3),
+            'p95': round(float(p95), 3),
+            'p99': round(float(p99), 3),
+            'max': round(float(latencies.max()), 3)
+        }
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="HTTP API yük testi (SQLite + sentetik model)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Eşzamanlı istemci sayısı (varsayılan: 8)")
+    parser.add_argument('--duration', type=float, default=20, help="Ölçüm süresi, saniye (varsayılan: 20)")
+    parser.add_argument('--warmup', type=float, default=3, help="Ölçülmeyen ısınma süresi, saniye (varsayılan: 3)")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"İşlem ağırlıkları (varsayılan: {DEFAULT_MIX})")
+    parser.add_argument('--users', type=int, default=20, help="Test kullanıcısı sayısı (varsayılan: 20)")
+    parser.add_argument('--history-per-user', type=int, default=30, help="Kullanıcı başına başlangıç geçmişi")
+    parser.add_argument('--favorites-per-user', type=int, default=5, help="Kullanıcı başına başlangıç favorisi")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--url', help="Çalışan bir sunucuya karşı çalıştır (sunucu ve model başlatılmaz)")
+    parser.add_argument('--server', choices=['production', 'development'], default='production',
+                        help="production: gunicorn, development: Flask geliştirme sunucusu")
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn worker sayısı (WEB_CONCURRENCY)")
+    parser.add_argument('--threads', type=int, default=4, help="gunicorn worker başına thread (GUNICORN_THREADS)")
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--n-estimators', type=int, default=20, help="Sentetik modeldeki ağaç sayısı")
+    parser.add_argument('--workdir', help="Model, veritabanı ve sunucu logu için dizin (varsayılan: geçici dizin)")
+    parser.add_argument('--output', help="Sonuç JSON dosyası (varsayılan: stdout)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = args.workdir or tempfile.mkdtemp(prefix='trafik-loadtest-')
+    os.makedirs(workdir, exist_ok=True)
+    proc = log = None
+    startup_seconds = None
+
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            print(f"⏳ Sentetik model eğitiliyor ({args.n_estimators} ağaç): {workdir}", file=sys.stderr)
+            # Eğitim çıktısı stdout'a yazılan JSON'a karışmasın
+            with contextlib.redirect_stdout(sys.stderr):
+                train_synthetic_model(os.path.join(workdir, 'models'), n_estimators=args.n_estimators, seed=args.seed)
+            base_url = f"http://127.0.0.1:{args.port}"
+            proc, log = start_server(args, workdir)
+        startup_seconds = wait_until_ready(base_url, proc)
+        print(f"✅ Sunucu hazır ({startup_seconds:.2f} sn), kullanıcılar oluşturuluyor...", file=sys.stderr)
+
+        users = seed_users(base_url, args.users, args.history_per_user, args.favorites_per_user, args.seed)
+        print(f"🚀 Yük testi: {args.concurrency} istemci, {args.duration:.0f} sn (+{args.warmup:.0f} sn ısınma)",
+              file=sys.stderr)
+        results = run_load(base_url, users, args.mix, args.concurrency, args.duration, args.warmup, args.seed)
+    finally:
+        if proc is not None:
+            stop_server(proc)
+            log.close()
+
+    all_samples = [sample for samples in results.values() for sample in samples]
+    report = {
+        'benchmark': 'load_test',
+        'schema_version': 1,
+        'started_at': dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'config': {
+            'url': args.url,
+            'server': None if args.url else args.server,
+            'workers': None if args.url or args.server == 'development' else args.workers,
+            'threads': None if args.url or args.server == 'development' else args.threads,
+            'concurrency': args.concurrency,
+            'duration_seconds': args.duration,
+            'warmup_seconds': args.warmup,
+            'mix': args.mix,
+            'users': args.users,
+            'n_estimators': None if args.url else args.n_estimators,
+            'seed': args.seed
+        },
+        'startup_seconds': round(startup_seconds, 3) if startup_seconds is not None else None,
+        'endpoints': {name: summarize(samples, args.duration) for name, samples in results.items()},
+        'total': summarize(all_samples, args.duration)
+    }
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"💾 Sonuçlar '{args.output}' dosyasına yazıldı.", file=sys.stderr)
+    else:
+        print(text)
+
+    if not args.workdir and not args.url:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark'lar için sentetik sensör verisi ve küçük model
+
+İBB verisi olmadan tekrarlanabilir ölçüm yapabilmek için CSV ile aynı
+kolonlara sahip sensör verisi üretir ve train_model.py'deki aynı rota veri
+seti adımlarıyla küçük bir orman eğitir.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from model_loader import FEATURES, ISTANBUL_BBOX  # noqa: E402
+from model_registry import MODEL_FILENAME, ModelRegistry  # noqa: E402
+
+SYNTHETIC_VERSION = 'synthetic'
+
+
+def make_sensor_frame(n_sensors=60, days=14, start='2024-12-01', seed=42, bbox=ISTANBUL_BBOX):
+    """İBB trafik CSV'si kolonlarında (DATE_TIME, LATITUDE, LONGITUDE,
+    AVERAGE_SPEED, ...) saatlik sentetik sensör ölçümleri üretir.
+
+    Hızlar sensörün taban hızı, sabah/akşam zirvesi, hafta sonu ve gürültüden oluşur.
+    """
+    rng = np.random.default_rng(seed)
+    lat_min, lon_min, lat_max, lon_max = bbox
+    lats = rng.uniform(lat_min, lat_max, n_sensors)
+    lons = rng.uniform(lon_min, lon_max, n_sensors)
+    base_speed = rng.uniform(30, 90, n_sensors)
+
+    times = pd.date_range(start, periods=days * 24, freq='h')
+    hours = times.hour.to_numpy()
+    rush = np.where(((hours >= 7) & (hours <= 9)) | ((hours >= 17) & (hours <= 19)), 0.55, 1.0)
+    night = np.where((hours >= 22) | (hours <= 5), 1.25, 1.0)
+    weekend = np.where(times.dayofweek.to_numpy() >= 5, 1.15, 1.0)
+    factor = rush * night * weekend
+
+    speeds = base_speed[None, :] * factor[:, None] * rng.normal(1.0, 0.08, (len(times), n_sensors))
+    speeds = np.clip(speeds, 5, 130)
+    vehicles = rng.integers(5, 300, (len(times), n_sensors))
+
+    return pd.DataFrame({
+        'DATE_TIME': np.repeat(times.strftime('%Y-%m-%d %H:%M:%S'), n_sensors),
+        'LATITUDE': np.tile(lats, len(times)),
+        'LONGITUDE': np.tile(lons, len(times)),
+        'MINIMUM_SPEED': np.floor(speeds * 0.6).ravel(),
+        'MAXIMUM_SPEED': np.ceil(speeds * 1.3).ravel(),
+        'AVERAGE_SPEED': np.round(speeds, 1).ravel(),
+        'NUMBER_OF_VEHICLES': vehicles.ravel(),
+    })
+
+
+def train_synthetic_model(model_dir, n_estimators=20, n_sensors=60, days=14, seed=42, compile=True):
+    """Sentetik veriyle model eğitir ve model_dir altına 'synthetic' versiyonu olarak kaydeder.
+
+    (registry, model_path) döndürür; MODEL_DIR=model_dir ile sunucu bu modeli yükler.
+    """
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+    from train_model import create_route_dataset, export_compiled_model
+
+    df = make_sensor_frame(n_sensors=n_sensors, days=days, seed=seed)
+    route_df = create_route_dataset(df, num_routes_per_timestamp=5, seed=seed)
+
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=seed, n_jobs=-1)
+    model.fit(route_df[FEATURES], route_df['avg_speed'])
+
+    registry = ModelRegistry(model_dir, legacy_path=os.path.join(model_dir, MODEL_FILENAME))
+    model_path = os.path.join(registry.version_dir(SYNTHETIC_VERSION), MODEL_FILENAME)
+    joblib.dump(model, model_path)
+    if compile:
+        export_compiled_model(model_path, model)
+    registry.activate(SYNTHETIC_VERSION)
+    return registry, model_path
+
+
+def random_routes(n, seed=0, bbox=ISTANBUL_BBOX):
+    """bbox içinde rastgele (start_lat, start_lon, end_lat, end_lon) dizileri ve zamanlar üretir"""
+    rng = np.random.default_rng(seed)
+    lat_min, lon_min, lat_max, lon_max = bbox
+    start_lats = rng.uniform(lat_min, lat_max, n)
+    start_lons = rng.uniform(lon_min, lon_max, n)
+    end_lats = rng.uniform(lat_min, lat_max, n)
+    end_lons = rng.uniform(lon_min, lon_max, n)
+    minutes = rng.integers(0, 365 * 24 * 60, n)
+    times = pd.Timestamp('2025-01-01') + pd.to_timedelta(minutes, unit='min')
+    return start_lats, start_lons, end_lats, end_lons, times.to_pydatetime()
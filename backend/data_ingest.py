@@ -0,0 +1,143 @@
+"""
+Eğitim verisinin okunması: parça parça, tipli CSV okuma ve kolon bazlı önbellek
+
+Sadece rota veri setinin kullandığı kolonlar, küçük tiplerle ve chunk'lar
+halinde okunur; tam CSV hiçbir zaman object tipli bir DataFrame olarak bellekte
+durmaz. Her kaynak dosya okunduktan sonra içerik hash'i ile adlandırılan bir NPZ
+dosyasına yazılır. Aynı dosya sonraki eğitimlerde CSV ayrıştırılmadan bu
+önbellekten yüklenir.
+"""
+import glob
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CSV = os.path.normpath(os.path.join(BACKEND_DIR, '..', 'ibb_traffic_2024_12.csv'))
+DEFAULT_CACHE_DIR = os.path.join(BACKEND_DIR, 'data_cache')
+
+# Rota veri seti için gereken kolonlar ve bellekteki tipleri.
+# float32 koordinatlarda hata 41. enlemde < 0.5 m, hızlarda < 0.00001 km/s'dir.
+INGEST_COLUMNS = ['DATE_TIME', 'LATITUDE', 'LONGITUDE', 'AVERAGE_SPEED']
+INGEST_DTYPES = {'LATITUDE': 'float32', 'LONGITUDE': 'float32', 'AVERAGE_SPEED': 'float32'}
+CHUNK_ROWS = 500_000
+
+# Kolonlar ya da tipler değişirse eski önbellek dosyaları kullanılmasın
+CACHE_FORMAT = 'v1'
+
+_hash_memo = {}
+
+
+def resolve_input_files(patterns):
+    """Dosya yollarını ve glob desenlerini (ör. 'data/ibb_traffic_2024_*.csv') dosya listesine çevirir.
+
+    Desenler verilen sırada, her desenin eşleşmeleri ada göre sıralı döner; aynı
+    dosya iki kez alınmaz. Eşleşmeyen desen FileNotFoundError fırlatır.
+    """
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        matches = [path for path in matches if os.path.isfile(path)]
+        if not matches:
+            raise FileNotFoundError(pattern)
+        for path in matches:
+            path = os.path.abspath(path)
+            if path not in files:
+                files.append(path)
+    return files
+
+
+def file_hash(path):
+    """Dosya içeriğinin SHA-256 özeti. Aynı süreçte değişmemiş dosya tekrar okunmaz."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _hash_memo.get(memo_key)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                hasher.update(block)
+        digest = _hash_memo[memo_key] = hasher.hexdigest()
+    return digest
+
+
+def source_fingerprint(files):
+    """Dosya listesinin (sıra dahil) içerik parmak izi"""
+    hasher = hashlib.sha256(CACHE_FORMAT.encode())
+    for path in files:
+        hasher.update(file_hash(path).encode())
+    return hasher.hexdigest()
+
+
+def read_csv_columns(path, chunk_rows=CHUNK_ROWS):
+    """CSV'den INGEST_COLUMNS kolonlarını chunk'lar halinde okur, dizi sözlüğü döndürür.
+
+    Tarihi çözülemeyen ya da koordinatı/hızı boş satırlar atlanır.
+    """
+    parts = {name: [] for name in INGEST_COLUMNS}
+    reader = pd.read_csv(path, usecols=INGEST_COLUMNS, dtype=INGEST_DTYPES, chunksize=chunk_rows)
+    for chunk in reader:
+        times = pd.to_datetime(chunk['DATE_TIME'], format='ISO8601', errors='coerce').to_numpy('datetime64[s]')
+        lats = chunk['LATITUDE'].to_numpy()
+        lons = chunk['LONGITUDE'].to_numpy()
+        speeds = chunk['AVERAGE_SPEED'].to_numpy()
+        keep = ~np.isnat(times) & np.isfinite(lats) & np.isfinite(lons) & np.isfinite(speeds)
+        for name, values in zip(INGEST_COLUMNS, (times, lats, lons, speeds)):
+            parts[name].append(values[keep])
+    return {
+        name: np.concatenate(values) if values else np.empty(0, dtype=INGEST_DTYPES.get(name, 'datetime64[s]'))
+        for name, values in parts.items()
+    }
+
+
+def write_columns(path, columns):
+    """Kolon dizilerini NPZ olarak atomik yazar; yarım dosya hiçbir zaman path adıyla görünmez"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **columns)
+    os.replace(tmp_path, path)
+
+
+def read_columns(path, names):
+    """write_columns ile yazılmış NPZ'den istenen kolonları okur"""
+    with np.load(path) as data:
+        return {name: data[name] for name in names}
+
+
+def cache_path_for(path, cache_dir=DEFAULT_CACHE_DIR):
+    return os.path.join(cache_dir, f"{CACHE_FORMAT}-{file_hash(path)}.npz")
+
+
+def load_file_columns(path, cache_dir=DEFAULT_CACHE_DIR, use_cache=True, chunk_rows=CHUNK_ROWS):
+    """Tek dosyanın kolonlarını önbellekten, yoksa CSV'den okuyup önbelleğe yazarak döndürür"""
+    cached = cache_path_for(path, cache_dir) if use_cache else None
+    if cached and os.path.exists(cached):
+        columns = read_columns(cached, INGEST_COLUMNS)
+        print(f"  ⚡ {os.path.basename(path)}: önbellekten {len(columns['LATITUDE'])} satır")
+        return columns
+
+    columns = read_csv_columns(path, chunk_rows=chunk_rows)
+    print(f"  📄 {os.path.basename(path)}: CSV'den {len(columns['LATITUDE'])} satır okundu")
+    if cached:
+        write_columns(cached, columns)
+    return columns
+
+
+def load_traffic_data(patterns=DEFAULT_CSV, cache_dir=DEFAULT_CACHE_DIR, use_cache=True, chunk_rows=CHUNK_ROWS):
+    """Bir ya da birden fazla CSV'yi (glob desenleri dahil) tek DataFrame olarak yükler.
+
+    Dönen DataFrame sadece INGEST_COLUMNS kolonlarını içerir; DATE_TIME
+    datetime64, diğerleri float32'dir. Satırlar dosya sırasıyla birleştirilir.
+    """
+    files = resolve_input_files(patterns)
+    parts = [load_file_columns(path, cache_dir, use_cache, chunk_rows) for path in files]
+    if len(parts) == 1:
+        columns = parts[0]
+    else:
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in INGEST_COLUMNS}
+    return pd.DataFrame(columns, copy=False)
@@ -1,9 +1,11 @@
 """
 Database bağlantısı ve modeller
 """
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, func
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, Index, func
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 from datetime import datetime, timezone
+import hashlib
+import json
 import os
 from dotenv import load_dotenv
 
@@ -70,6 +72,12 @@ class SearchHistory(Base):
     # İlişki
     user = relationship("User", back_populates="search_history")
 
+    # GET /history: user_id filtresi + created_at sıralaması indeksten okunur (filesort yok).
+    # Mevcut veritabanlarına migrations.py ekler.
+    __table_args__ = (
+        Index('ix_search_history_user_created', 'user_id', 'created_at'),
+    )
+
 
 class Favorite(Base):
     __tablename__ = 'favorites'
@@ -87,17 +95,37 @@ class Favorite(Base):
     
     # İsim (kullanıcı tarafından verilebilir)
     name = Column(String(255), nullable=True)
+
+    # (origin, destination) çiftinin özeti; verilmezse eklenirken hesaplanır
+    route_key = Column(String(64), nullable=False, default=lambda context: favorite_route_key(
+        context.get_current_parameters()['origin'], context.get_current_parameters()['destination']
+    ))
     
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     
     # İlişki
     user = relationship("User", back_populates="favorites")
 
+    # GET /favorites sıralaması ve POST /favorites tekrar kontrolü için.
+    # MySQL'de utf8mb4 ile 500 karakterlik iki kolon 3072 byte'lık anahtar
+    # sınırını aştığı için benzersizlik kolonların kendisi yerine route_key
+    # özeti üzerindendir; böylece her veritabanında tam metin karşılaştırılır.
+    __table_args__ = (
+        Index('ix_favorites_user_created', 'user_id', 'created_at'),
+        Index('uq_favorites_user_route_key', 'user_id', 'route_key', unique=True),
+    )
+
 
 # ======================
 #  YARDIMCI FONKSİYONLAR
 # ======================
 
+def favorite_route_key(origin, destination):
+    """Favori benzersizlik anahtarı: (origin, destination) çiftinin sha256 özeti (64 karakter)"""
+    payload = json.dumps([str(origin), str(destination)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
 def get_db():
     """Database session'ı döndürür"""
     db = SessionLocal()
@@ -108,9 +136,12 @@ def get_db():
 
 
 def init_db():
-    """Database tablolarını oluşturur"""
+    """Database tablolarını oluşturur ve bekleyen şema migrasyonlarını uygular"""
+    from migrations import run_migrations
+
     Base.metadata.create_all(bind=engine)
     print("✅ Database tabloları oluşturuldu")
+    run_migrations(engine)
 
 
 if __name__ == "__main__":
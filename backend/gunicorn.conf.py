@@ -0,0 +1,64 @@
+"""
+Gunicorn ayarları (production sunucusu)
+
+Varsayılan olarak worker'lar hemen fork edilir, istek kabul eder ve modeli
+arka planda kendileri yükler (/health hemen 200, /ready hazır olana kadar 503).
+Model derlenmiş dosyadan bellek eşlemeli açılır (MODEL_MMAP=1); dizilerin tek
+kopyası page cache'te durur ve worker'lar arasında paylaşılır.
+
+GUNICORN_PRELOAD=1 ile model fork'tan önce master'da bir kez yüklenir ve
+sayfaları copy-on-write paylaşılır. Bu modda model yüklenene kadar hiçbir
+worker yoktur, /health de cevap vermez.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5001)}"
+
+# Worker ve thread sayıları: WEB_CONCURRENCY / GUNICORN_THREADS
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# GUNICORN_PRELOAD=1: model ve ağır importlar fork'tan önce master'da yüklenir
+preload_app = os.getenv('GUNICORN_PRELOAD', '0') == '1'
+if not preload_app:
+    # Worker'lar modeli ayrı ayrı yükler; mmap'li derlenmiş model sayfaları paylaşır
+    os.environ.setdefault('MODEL_MMAP', '1')
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-' if os.getenv('GUNICORN_ACCESS_LOG') else None
+errorlog = '-'
+
+
+def when_ready(server):
+    # Port açıldı; preload'da model worker'lar fork edilmeden master'da yüklenir ki
+    # sayfaları paylaşılsın. Uygulama importu hafif olduğu için port modeli beklemez.
+    if preload_app:
+        from app import model_registry
+        if model_registry.current is None:
+            model_registry.reload()
+
+
+def pre_fork(server, worker):
+    # Yüklenmiş nesneleri GC'nin kalıcı nesillerine taşır; aksi halde worker'lardaki
+    # GC taramaları nesne başlıklarına yazıp paylaşılan sayfaları kopyalatır
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Master'da açılmış olabilecek DB bağlantıları worker'lar arasında paylaşılmamalı
+    from database import engine
+    engine.dispose(close=False)
+    # Thread'ler fork'ta kopyalanmaz; model izleyicisi her worker'da başlatılır
+    from app import start_background_tasks
+    start_background_tasks()
+
+
+def worker_exit(server, worker):
+    # Write-behind kuyruğunda kalan geçmiş kayıtları worker kapanmadan yazılır
+    from app import history_writer
+    history_writer.stop()
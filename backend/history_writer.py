@@ -0,0 +1,169 @@
+"""
+Arama geçmişi için write-behind kuyruğu
+
+POST /history (HISTORY_WRITE_BEHIND=1) ve user_id verilen /predict istekleri
+kaydı veritabanına yazmak yerine bu kuyruğa ekleyip hemen döner. Arka plandaki
+tek bir thread kayıtları HISTORY_BATCH_SIZE'lık gruplar ya da
+HISTORY_FLUSH_INTERVAL saniye dolunca tek transaction'da toplu ekler. Kuyruk
+doluysa POST /history kısa bir süre bekler, yine yer açılmazsa reddedilir
+(istemci 503 + Retry-After alır); /predict beklemez, kaydı atlar. Süreç
+kapanırken kuyrukta kalanlar yazılır.
+
+Kuyruk süreç içidir: süreç aniden öldürülürse (SIGKILL, OOM) henüz yazılmamış
+kayıtlar kaybolur.
+"""
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+from database import SearchHistory, User
+from metrics import HISTORY_FLUSH_SECONDS, HISTORY_WRITES_TOTAL
+
+
+class HistoryWriter:
+    def __init__(self, session_factory, max_queue=10000, batch_size=200, flush_interval=0.5,
+                 enqueue_timeout=0.1, max_retries=3, on_write=None):
+        """session_factory: commit/rollback yapan session context manager'ı (app.get_db_session)
+
+        on_write: her grup commit edildikten sonra gruptaki user_id kümesiyle çağrılır
+        """
+        self.session_factory = session_factory
+        self.on_write = on_write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max_retries
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        """Yazıcı thread'ini başlatır; birden fazla çağrılması ya da fork sonrası çağrılması sorun değildir"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        """Kuyrukta kalanları yazar ve thread'i durdurur"""
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return
+        self._stop.set()
+        thread.join(timeout)
+        if thread.is_alive():
+            print(f"⚠️ Geçmiş kuyruğu {timeout} sn içinde boşaltılamadı ({self.depth()} kayıt kaldı)")
+
+    def enqueue(self, row, wait=True):
+        """SearchHistory kolon sözlüğünü kuyruğa ekler.
+
+        Kuyruk doluysa enqueue_timeout kadar bekler (wait=False ise hiç
+        beklemez); yer açılmazsa False döner.
+        """
+        self.start()
+        try:
+            if wait:
+                self._queue.put(row, timeout=self.enqueue_timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            HISTORY_WRITES_TOTAL.inc(outcome='rejected')
+            return False
+        HISTORY_WRITES_TOTAL.inc(outcome='queued')
+        return True
+
+    def depth(self):
+        return self._queue.qsize()
+
+    # ----------------------
+    #  Yazıcı thread'i
+    # ----------------------
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            elif self._stop.is_set():
+                return
+
+    def _next_batch(self):
+        """İlk kayıttan sonra batch_size dolana ya da flush_interval geçene kadar toplar"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            # Kapanırken beklemeden boşaltılır
+            remaining = 0 if self._stop.is_set() else deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                if remaining <= 0:
+                    break
+        return batch
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        error = self._insert(batch)
+        if error is None:
+            written = batch
+        elif len(batch) > 1 and not isinstance(error, OperationalError):
+            # Hatalı bir kayıt grubun tamamını düşürmesin: kayıtlar tek tek denenir,
+            # sadece yazılamayanlar atılır
+            print(f"⚠️ Geçmiş grubu yazılamadı, {len(batch)} kayıt tek tek deneniyor")
+            written = [row for row in batch if self._insert([row]) is None]
+        else:
+            written = []
+
+        if len(written) < len(batch):
+            HISTORY_WRITES_TOTAL.inc(len(batch) - len(written), outcome='dropped')
+        if not written:
+            return
+        HISTORY_FLUSH_SECONDS.observe(time.perf_counter() - started)
+        HISTORY_WRITES_TOTAL.inc(len(written), outcome='written')
+        if self.on_write is not None:
+            try:
+                self.on_write({row['user_id'] for row in written})
+            except Exception as e:
+                print(f"⚠️ Geçmiş yazma sonrası bildirim hatası: {e}")
+
+    def _insert(self, rows):
+        """Kayıtları tek transaction'da ekler; başarılıysa None, değilse son hatayı döndürür.
+
+        Sadece geçici hatalar (OperationalError: bağlantı, kilit, deadlock) tekrar
+        denenir; veri hataları tekrar denense de değişmez.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.session_factory() as db:
+                    # Demo mod: olmayan kullanıcılar POST /history'deki gibi oluşturulur
+                    user_ids = {row['user_id'] for row in rows}
+                    existing = {user_id for (user_id,) in db.query(User.id).filter(User.id.in_(user_ids))}
+                    missing = sorted(user_ids - existing)
+                    if missing:
+                        db.execute(insert(User), [
+                            {'id': user_id, 'email': f"user_{user_id}@demo.com", 'password_hash': 'demo'}
+                            for user_id in missing
+                        ])
+                    db.execute(insert(SearchHistory), rows)
+                return None
+            except OperationalError as e:
+                print(f"⚠️ Geçmiş yazma hatası ({len(rows)} kayıt, deneme {attempt + 1}): {e}")
+                if attempt == self.max_retries:
+                    return e
+                if not self._stop.is_set():
+                    time.sleep(min(0.5 * 2 ** attempt, 5))
+            except Exception as e:
+                print(f"⚠️ Geçmiş kaydı yazılamadı ({len(rows)} kayıt): {e}")
+                return e
@@ -0,0 +1,186 @@
+"""
+Süreç içi metrikler ve Prometheus metin formatı (/metrics)
+
+Harici bağımlılık yoktur. Her gözlem bir kilit altında birkaç sayı günceller,
+istek başına maliyet mikrosaniyeler düzeyindedir. Değerler süreç başınadır;
+gunicorn'da her worker kendi sayaçlarını tutar ve seriler "pid" etiketiyle
+ayrılır.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Saniye cinsinden gecikme kovaları (0.1 ms - 10 sn)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Yalnızca artan sayaç"""
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self, const_labels):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            yield f"{self.name}{_format_labels(self.labelnames, key, const_labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """Kümülatif kovalı histogram (Prometheus histogram tipi)"""
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # etiketler -> [kova sayıları..., +Inf sayısı, toplam]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """with bloğunun süresini gözlemler"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self, const_labels):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state[:-1]):
+                cumulative += count
+                le = (('le', _format_value(float(bound))),)
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, tuple(const_labels) + le)} {cumulative}"
+            labels = _format_labels(self.labelnames, key, const_labels)
+            yield f"{self.name}_sum{labels} {_format_value(state[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class CallbackMetric:
+    """Değeri /metrics okunurken bir fonksiyondan alınan gauge ya da sayaç.
+
+    Fonksiyon tek bir sayı ya da {etiket değerleri demeti: sayı} sözlüğü döndürür.
+    """
+
+    def __init__(self, name, documentation, func, type_name='gauge', labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        self.type_name = type_name
+        self.labelnames = tuple(labelnames)
+
+    def samples(self, const_labels):
+        values = self.func()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key, const_labels)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, func, type_name='gauge', labelnames=()):
+        return self.register(CallbackMetric(name, documentation, func, type_name, labelnames))
+
+    def render(self):
+        """Tüm metrikleri Prometheus metin formatında (0.0.4) döndürür"""
+        const_labels = (('pid', os.getpid()),)
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            try:
+                lines.extend(metric.samples(const_labels))
+            except Exception as e:
+                lines.append(f"# {metric.name} okunamadı: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Endpoint bazında istek süresi', ('route', 'method')
+)
+REQUESTS_TOTAL = REGISTRY.counter(
+    'http_requests_total', 'Endpoint ve durum koduna göre istek sayısı', ('route', 'method', 'status')
+)
+PREDICT_STAGE_SECONDS = REGISTRY.histogram(
+    'predict_stage_duration_seconds', '/predict aşamalarının süresi', ('stage',)
+)
+DB_SESSION_SECONDS = REGISTRY.histogram(
+    'db_session_duration_seconds', 'get_db_session bloğunun süresi (sorgular + commit)', ('outcome',)
+)
+BCRYPT_SECONDS = REGISTRY.histogram(
+    'bcrypt_duration_seconds', 'bcrypt hash ve doğrulama süresi', ('operation',),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5)
+)
+HISTORY_WRITES_TOTAL = REGISTRY.counter(
+    'history_writes_total', 'Write-behind geçmiş kayıtları (queued, rejected, written, dropped)', ('outcome',)
+)
+HISTORY_FLUSH_SECONDS = REGISTRY.histogram(
+    'history_flush_duration_seconds', 'Write-behind geçmiş grubunun veritabanına yazılma süresi'
+)
@@ -0,0 +1,187 @@
+"""
+Şema migrasyonları
+
+init_db() yeni tabloları create_all ile oluşturur ama mevcut tabloları
+değiştiremez. Buradaki migrasyonlar sırayla, her biri bir kez uygulanır ve
+schema_migrations tablosuna kaydedilir. Her migrasyon mevcut durumu kontrol
+ederek çalışır; create_all'un zaten oluşturduğu bir indeks tekrar eklenmez.
+
+MySQL'de birden fazla worker aynı anda başlarsa GET_LOCK ile sadece biri
+migrasyon uygular, diğerleri bekleyip uygulanmış listeyi okur.
+
+Kullanım:
+    python migrations.py           # bekleyen migrasyonları uygular
+    python migrations.py --status  # uygulanmış / bekleyen listesini gösterir
+"""
+import argparse
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, text
+
+from database import Favorite, SearchHistory, engine as default_engine, favorite_route_key
+
+MIGRATION_LOCK_NAME = 'traffic_schema_migrations'
+MIGRATION_LOCK_TIMEOUT = 60
+
+# 0001'in (user_id, origin, destination) benzersiz indeksi; 0002 bunu route_key
+# indeksiyle değiştirir. MySQL'de ilk 380 karakter indekslenirdi.
+LEGACY_FAVORITE_INDEX = 'uq_favorites_user_route'
+LEGACY_FAVORITE_KEY_PREFIX = 380
+ROUTE_KEY_BATCH_SIZE = 1000
+
+migration_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', migration_metadata,
+    Column('version', String(100), primary_key=True),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def _index_names(conn, table_name):
+    return {index['name'] for index in inspect(conn).get_indexes(table_name)}
+
+
+def _create_missing_indexes(conn, model, names=None):
+    """Modelin __table_args__ indekslerinden veritabanında olmayanları oluşturur (names: sadece bunlar)"""
+    existing = _index_names(conn, model.__tablename__)
+    for index in model.__table__.indexes:
+        if index.name not in existing and (names is None or index.name in names):
+            print(f"  + {model.__tablename__}.{index.name}")
+            index.create(conn)
+
+
+def _dedupe_favorites(conn, key):
+    """Benzersiz indeks öncesi key (SQL ifade listesi) aynı olan favorilerden en eskisini bırakır"""
+    # MySQL DELETE içinde aynı tabloya alt sorguya izin vermediği için id'ler türetilmiş tablodan okunur
+    result = conn.execute(text(
+        "DELETE FROM favorites WHERE id NOT IN ("
+        f" SELECT id FROM (SELECT MIN(id) AS id FROM favorites GROUP BY {key}) AS keep_ids"
+        ")"
+    ))
+    if result.rowcount:
+        print(f"  - {result.rowcount} tekrarlanan favori silindi")
+
+
+def _history_favorites_indexes(conn):
+    _create_missing_indexes(conn, SearchHistory)
+    _create_missing_indexes(conn, Favorite, names={'ix_favorites_user_created'})
+    if LEGACY_FAVORITE_INDEX in _index_names(conn, 'favorites'):
+        return
+    # MySQL'de indeks origin/destination'ın ilk LEGACY_FAVORITE_KEY_PREFIX karakterini
+    # kapsar (utf8mb4 ile 3072 byte sınırı); tekrarlar da aynı önekle gruplanır
+    if conn.dialect.name == 'mysql':
+        prefix = LEGACY_FAVORITE_KEY_PREFIX
+        _dedupe_favorites(conn, f"user_id, LEFT(origin, {prefix}), LEFT(destination, {prefix})")
+        columns = f"user_id, origin({prefix}), destination({prefix})"
+    else:
+        _dedupe_favorites(conn, "user_id, origin, destination")
+        columns = "user_id, origin, destination"
+    print(f"  + favorites.{LEGACY_FAVORITE_INDEX}")
+    conn.execute(text(f"CREATE UNIQUE INDEX {LEGACY_FAVORITE_INDEX} ON favorites ({columns})"))
+
+
+def _favorites_route_key(conn):
+    """favorites.route_key kolonunu ekleyip doldurur, benzersizliği bu kolona taşır.
+
+    Önekli MySQL indeksi ile tam metin karşılaştıran SQLite farklı favorileri
+    tekrar sayabiliyordu; özet her veritabanında tüm metni kapsar.
+    """
+    if 'route_key' not in {column['name'] for column in inspect(conn).get_columns('favorites')}:
+        print("  + favorites.route_key")
+        # Mevcut satırlar için boş eklenir; yeni tablolarda create_all NOT NULL oluşturur
+        conn.execute(text("ALTER TABLE favorites ADD COLUMN route_key VARCHAR(64)"))
+
+    while True:
+        rows = conn.execute(text(
+            f"SELECT id, origin, destination FROM favorites WHERE route_key IS NULL LIMIT {ROUTE_KEY_BATCH_SIZE}"
+        )).all()
+        if not rows:
+            break
+        conn.execute(text("UPDATE favorites SET route_key = :route_key WHERE id = :id"), [
+            {'id': row.id, 'route_key': favorite_route_key(row.origin, row.destination)} for row in rows
+        ])
+
+    _dedupe_favorites(conn, "user_id, route_key")
+    _create_missing_indexes(conn, Favorite)
+    # Eski indeks yenisi oluştuktan sonra silinir; MySQL'de user_id yabancı anahtarı
+    # ix_favorites_user_created'ı kullanmaya devam eder
+    if LEGACY_FAVORITE_INDEX in _index_names(conn, 'favorites'):
+        print(f"  - favorites.{LEGACY_FAVORITE_INDEX}")
+        on_table = " ON favorites" if conn.dialect.name == 'mysql' else ""
+        conn.execute(text(f"DROP INDEX {LEGACY_FAVORITE_INDEX}{on_table}"))
+
+
+# (versiyon, açıklama, fonksiyon) - yeni migrasyonlar sona eklenir, eskileri değiştirilmez
+MIGRATIONS = [
+    ('0001_history_favorites_indexes',
+     "search_history/favorites (user_id, created_at) indeksleri, favorites benzersiz rota indeksi",
+     _history_favorites_indexes),
+    ('0002_favorites_route_key',
+     "favorites.route_key (origin/destination özeti), benzersiz indeks (user_id, route_key)",
+     _favorites_route_key),
+]
+
+
+@contextmanager
+def _migration_lock(conn):
+    """MySQL'de süreçler arası kilit; diğer veritabanlarında (SQLite) kilitsiz çalışır"""
+    if conn.dialect.name != 'mysql':
+        yield
+        return
+    acquired = conn.execute(
+        text("SELECT GET_LOCK(:name, :timeout)"), {'name': MIGRATION_LOCK_NAME, 'timeout': MIGRATION_LOCK_TIMEOUT}
+    ).scalar()
+    if acquired != 1:
+        raise RuntimeError(f"Migrasyon kilidi {MIGRATION_LOCK_TIMEOUT} sn içinde alınamadı")
+    try:
+        yield
+    finally:
+        conn.execute(text("SELECT RELEASE_LOCK(:name)"), {'name': MIGRATION_LOCK_NAME})
+
+
+def applied_versions(conn):
+    schema_migrations.create(conn, checkfirst=True)
+    return {row.version for row in conn.execute(schema_migrations.select())}
+
+
+def run_migrations(engine=default_engine):
+    """Bekleyen migrasyonları sırayla uygular, uygulananların listesini döndürür"""
+    applied_now = []
+    with engine.connect() as conn:
+        with _migration_lock(conn):
+            done = applied_versions(conn)
+            conn.commit()
+            for version, description, migrate in MIGRATIONS:
+                if version in done:
+                    continue
+                print(f"🔧 Migrasyon uygulanıyor: {version} ({description})")
+                # MySQL'de DDL örtük commit yapar; kayıt migrasyon tamamlandıktan sonra yazılır
+                migrate(conn)
+                conn.execute(schema_migrations.insert().values(
+                    version=version, applied_at=datetime.now(timezone.utc)
+                ))
+                conn.commit()
+                applied_now.append(version)
+    if applied_now:
+        print(f"✅ {len(applied_now)} migrasyon uygulandı")
+    return applied_now
+
+
+def print_status(engine=default_engine):
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+        conn.commit()
+    for version, description, _ in MIGRATIONS:
+        mark = '✅' if version in done else '⏳'
+        print(f"{mark} {version}: {description}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Veritabanı şema migrasyonları")
+    parser.add_argument('--status', action='store_true', help="Uygulanmış ve bekleyen migrasyonları listeler")
+    args = parser.parse_args()
+    if args.status:
+        print_status()
+    else:
+        run_migrations()
@@ -1,24 +1,413 @@
-import pandas as pd
-import joblib
+import numpy as np
 import os
+import json
+import warnings
+import datetime as dt
 from math import radians, cos, sin, asin, atan2, degrees, sqrt
 
+# Modelin eğitimde gördüğü özellik sırası (train_model.py ile aynı)
+FEATURES = [
+    'start_lat', 'start_lon',
+    'end_lat', 'end_lon',
+    'distance', 'bearing',
+    'hour', 'day_of_week', 'month'
+]
+
+# Hız grid'inin varsayılan kapsama alanı: (lat_min, lon_min, lat_max, lon_max)
+ISTANBUL_BBOX = (40.80, 28.50, 41.35, 29.45)
+
+def parse_datetime(value):
+    """datetime nesnesini olduğu gibi, ISO formatlı metni stdlib ile çevirir"""
+    if isinstance(value, dt.datetime):
+        return value
+    return dt.datetime.fromisoformat(str(value))
+
+
+def haversine_distance_array(lat1, lon1, lat2, lon2):
+    """Haversine mesafesini (km) NumPy dizileri üzerinde vektörel hesaplar"""
+    R = 6371  # Dünya yarıçapı (km)
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+    # Numerik hataları önlemek için a değerini sınırla
+    a = np.clip(a, 0.0, 1.0)
+    return R * 2 * np.arcsin(np.sqrt(a))
+
+
+def bearing_array(lat1, lon1, lat2, lon2):
+    """Yön açısını (0-360 derece) NumPy dizileri üzerinde vektörel hesaplar"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dlon = lon2 - lon1
+    y = np.sin(dlon) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return (np.degrees(np.arctan2(y, x)) + 360) % 360
+
+
+def generate_route_points(lat1, lon1, lat2, lon2, num_points=12):
+    """İki nokta arası rota noktalarını oluşturur"""
+    points = []
+    for i in range(num_points + 1):
+        ratio = i / num_points
+        current_lat = lat1 + (lat2 - lat1) * ratio
+        current_lon = lon1 + (lon2 - lon1) * ratio
+        points.append((current_lat, current_lon))
+    return points
+
+
+def compiled_path_for(model_path):
+    """Model dosyasının yanındaki derlenmiş orman dosyasının yolunu döndürür"""
+    return os.path.splitext(model_path)[0] + '.compiled.joblib'
+
+
+def compile_forest(model):
+    """Eğitilmiş RandomForestRegressor'ı düz NumPy dizilerine çevirir.
+
+    Tüm ağaçların düğümleri tek bir dizide art arda tutulur; children[:, 0]
+    sol, children[:, 1] sağ çocuğun bu global dizideki indeksidir. Yaprak
+    düğümlerin eşiği +inf'tir ve iki çocuğu da kendisidir, böylece
+    değerlendirme döngüsü yaprağa ulaşan satırlar için olduğu yerde kalır.
+    Sıkıştırmasız joblib.dump ile kaydedilen çıktı mmap_mode='r' ile
+    kopyalanmadan açılabilir.
+    """
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    sizes = np.array([tree.node_count for tree in trees], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    total = int(sizes.sum())
+
+    feature = np.empty(total, dtype=np.int32)
+    threshold = np.empty(total, dtype=np.float64)
+    children = np.empty((total, 2), dtype=np.int32)
+    value = np.empty(total, dtype=np.float64)
+
+    for tree, offset, size in zip(trees, offsets, sizes):
+        nodes = slice(offset, offset + size)
+        own_index = np.arange(offset, offset + size, dtype=np.int32)
+        is_leaf = tree.children_left == -1
+        feature[nodes] = np.where(is_leaf, 0, tree.feature)
+        threshold[nodes] = np.where(is_leaf, np.inf, tree.threshold)
+        children[nodes, 0] = np.where(is_leaf, own_index, tree.children_left + offset)
+        children[nodes, 1] = np.where(is_leaf, own_index, tree.children_right + offset)
+        value[nodes] = tree.value[:, 0, 0]
+
+    names = getattr(model, 'feature_names_in_', None)
+    return {
+        'feature': feature,
+        'threshold': threshold,
+        'children': children,
+        'value': value,
+        'roots': offsets.astype(np.int32),
+        'max_depth': max(tree.max_depth for tree in trees),
+        'feature_names': list(names) if names is not None else list(FEATURES)
+    }
+
+
+class CompiledForest:
+    """compile_forest çıktısını kullanan, sklearn'süz orman değerlendiricisi.
+
+    Bir satır grubu için tüm ağaçlar aynı anda yürünür; yaprağa ulaşan
+    (satır, ağaç) çiftleri birkaç adımda bir aktif kümeden çıkarılır.
+    Eşik karşılaştırması sklearn gibi float32 girdiyle yapılır, çıktı
+    sklearn predict ile float toleransı içinde aynıdır.
+    """
+
+    # Tek seferde yürünecek (satır x ağaç) çifti üst sınırı
+    MAX_PAIRS_PER_CHUNK = 1 << 20
+    # Yaprağa ulaşanların aktif kümeden kaç adımda bir ayıklanacağı
+    COMPACT_EVERY = 3
+
+    def __init__(self, arrays):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.children = arrays['children']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        self.feature_names_in_ = np.array(arrays['feature_names'], dtype=object)
+        self.n_features_in_ = len(self.feature_names_in_)
+        self.n_estimators = len(self.roots)
+        self._children_flat = self.children.reshape(-1)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        """joblib dosyasını yükler; mmap_mode='r' ile diziler diskten eşlenir, kopyalanmaz"""
+        import joblib
+        return cls(joblib.load(path, mmap_mode=mmap_mode))
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X {self.n_features_in_} kolonlu 2 boyutlu olmalı, {X.shape} geldi")
+
+        chunk = max(1, self.MAX_PAIRS_PER_CHUNK // self.n_estimators)
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), chunk):
+            out[start:start + chunk] = self._predict_chunk(X[start:start + chunk])
+        return out
+
+    def _predict_chunk(self, X):
+        n_rows, n_features = X.shape
+        x_flat = X.reshape(-1)
+        # Çiftler ağaç-öncelikli sıralanır: aynı ağacın düğümleri bellekte yakın durur
+        node = np.repeat(self.roots.astype(np.intp), n_rows)
+        row_base = np.tile(np.arange(n_rows, dtype=np.intp) * n_features, self.n_estimators)
+        pair = np.arange(node.size)
+        leaf_of_pair = np.empty(node.size, dtype=np.intp)
+
+        for step in range(1, self.max_depth + 2):
+            threshold = self.threshold[node]
+            go_right = x_flat[row_base + self.feature[node]] > threshold
+            if step % self.COMPACT_EVERY == 0 or step > self.max_depth:
+                # Eşiği +inf olanlar bu adımdan önce zaten yapraktaydı
+                done = np.isinf(threshold)
+                leaf_of_pair[pair[done]] = node[done]
+                active = ~done
+                node, row_base, pair = node[active], row_base[active], pair[active]
+                go_right = go_right[active]
+                if node.size == 0:
+                    break
+            node = self._children_flat[node * 2 + go_right]
+
+        return self.value[leaf_of_pair].reshape(self.n_estimators, n_rows).mean(axis=0)
+
+
+def grid_paths_for(model_path):
+    """Model dosyasının yanındaki hız grid'i (.npy) ve meta veri (.json) yollarını döndürür"""
+    base = os.path.splitext(model_path)[0]
+    return base + '.grid.npy', base + '.grid.json'
+
+
+class SpeedGrid:
+    """Modelin önceden hesaplanmış çıktılarını tutan hız tablosu.
+
+    values dizisinin şekli (başlangıç karesi, varış karesi, ay, haftanın günü,
+    saat) şeklindedir; kareler bbox'ın n_lat x n_lon parçaya bölünmesiyle
+    oluşur. Tahmin tek bir dizi indekslemesidir. Dosya bellek eşlemeli
+    (mmap) açıldığı için yalnızca dokunulan sayfalar belleğe gelir.
+    """
+
+    def __init__(self, values, meta):
+        self.values = values
+        self.meta = meta
+        self.lat_min, self.lon_min, self.lat_max, self.lon_max = meta['bbox']
+        self.n_lat = int(meta['n_lat'])
+        self.n_lon = int(meta['n_lon'])
+
+    @classmethod
+    def load(cls, npy_path, json_path):
+        with open(json_path) as f:
+            meta = json.load(f)
+        return cls(np.load(npy_path, mmap_mode='r'), meta)
+
+    @property
+    def n_tiles(self):
+        return self.n_lat * self.n_lon
+
+    def tile_centers(self):
+        """Her karenin merkez koordinatlarını (lats, lons) olarak döndürür"""
+        lat_step = (self.lat_max - self.lat_min) / self.n_lat
+        lon_step = (self.lon_max - self.lon_min) / self.n_lon
+        lat_idx, lon_idx = np.divmod(np.arange(self.n_tiles), self.n_lon)
+        return self.lat_min + (lat_idx + 0.5) * lat_step, self.lon_min + (lon_idx + 0.5) * lon_step
+
+    def tile_index(self, lats, lons):
+        """Koordinatların kare indekslerini ve bbox içinde olup olmadıklarını döndürür"""
+        lat_idx = np.floor((np.asarray(lats) - self.lat_min) / (self.lat_max - self.lat_min) * self.n_lat)
+        lon_idx = np.floor((np.asarray(lons) - self.lon_min) / (self.lon_max - self.lon_min) * self.n_lon)
+        inside = (lat_idx >= 0) & (lat_idx < self.n_lat) & (lon_idx >= 0) & (lon_idx < self.n_lon)
+        tiles = np.where(inside, lat_idx * self.n_lon + lon_idx, 0).astype(np.intp)
+        return tiles, inside
+
+    def lookup(self, start_lats, start_lons, end_lats, end_lons, hours, days_of_week, months):
+        """Grid'den hızları okur; (hızlar, iki ucu da bbox içinde olanlar) döndürür"""
+        origin, origin_inside = self.tile_index(start_lats, start_lons)
+        dest, dest_inside = self.tile_index(end_lats, end_lons)
+        months = np.asarray(months, dtype=np.intp) - 1
+        speeds = self.values[origin, dest, months, np.asarray(days_of_week, dtype=np.intp), np.asarray(hours, dtype=np.intp)]
+        return np.asarray(speeds, dtype=np.float64), origin_inside & dest_inside
+
+
 class TrafficModel:
-    def __init__(self, model_path='trafik_modeli.pkl'):
+    # Derlenmiş ormanın sklearn ile uyumunu yüklemede kontrol etmek için tolerans
+    COMPILED_TOLERANCE = 1e-6
+    # Bu satır sayısının üstünde sklearn'ün C döngüsü daha hızlı kalıyor
+    COMPILED_MAX_ROWS = 512
+
+    def __init__(self, model_path='trafik_modeli.pkl', mode='forest', mmap=False):
+        """mode='grid' ise tahminler önceden hesaplanmış hız grid'inden okunur,
+        grid dışında kalan rotalar için orman kullanılır.
+
+        mmap=True ise derlenmiş orman bellek eşlemeli (mmap_mode='r') açılır ve
+        sklearn pickle'ı hiç yüklenmez; aynı dosyayı açan süreçler tek bir
+        page-cache kopyasını paylaşır. Derlenmiş dosya yoksa (ya da eskiyse)
+        pickle mmap_mode='r' ile yüklenir, ancak sklearn ağaçları düğüm
+        dizilerini kendi belleğine kopyaladığı için bu yolda sayfalar
+        paylaşılmaz; her süreç modelin tam bir kopyasını tutar.
+        """
         self.model_path = model_path
+        self.mode = mode
+        self.mmap = mmap
         self.model = None
+        self.compiled = None
+        self.grid = None
+        # ModelRegistry tarafından doldurulur
+        self.version = None
+        self.loaded_at = None
+        self.load_seconds = None
         self._load_model()
 
     def _load_model(self):
         """Model dosyasını yükler."""
-        if os.path.exists(self.model_path):
+        if not os.path.exists(self.model_path):
+            print(f"⚠️ Dosya bulunamadı: {self.model_path}. Lütfen önce 'train_model.py' çalıştırın.")
+            return
+
+        if not (self.mmap and self._load_compiled_only()):
             try:
-                self.model = joblib.load(self.model_path)
+                # joblib (ve pickle açılırken sklearn) burada import edilir;
+                # modülü import etmek sunucunun açılışını geciktirmez
+                import joblib
+                model = joblib.load(self.model_path, mmap_mode='r' if self.mmap else None)
+                self._check_feature_names(model)
+                self.model = model
                 print(f"✅ Model yüklendi: {self.model_path}")
             except Exception as e:
                 print(f"❌ Model yüklenemedi: {e}")
-        else:
-            print(f"⚠️ Dosya bulunamadı: {self.model_path}. Lütfen önce 'train_model.py' çalıştırın.")
+                return
+            self._load_compiled()
+
+        if self.mode == 'grid':
+            self._load_grid()
+
+    def _fresh_compiled_path(self):
+        """Derlenmiş orman dosyası varsa ve modelden eski değilse yolunu döndürür"""
+        compiled_path = compiled_path_for(self.model_path)
+        if not os.path.exists(compiled_path):
+            return None
+        if os.path.getmtime(compiled_path) < os.path.getmtime(self.model_path):
+            print(f"⚠️ Derlenmiş model eski, kullanılmıyor: {compiled_path}. 'train_model.py --compile-only' çalıştırın.")
+            return None
+        return compiled_path
+
+    def _load_compiled_only(self):
+        """mmap modunda yalnızca derlenmiş ormanı bellek eşlemeli açar; başarılıysa True döner.
+
+        Süreçler arası sayfa paylaşımı sadece bu yolda olur. False dönerse
+        çağıran pickle'a geçer ve model süreç belleğine kopyalanır.
+        """
+        compiled_path = self._fresh_compiled_path()
+        if compiled_path is None:
+            return False
+        try:
+            compiled = CompiledForest.load(compiled_path, mmap_mode='r')
+            self._check_feature_names(compiled)
+        except Exception as e:
+            print(f"❌ Derlenmiş model kullanılamıyor: {e}")
+            return False
+        self.model = self.compiled = compiled
+        print(f"✅ Derlenmiş model bellek eşlemeli yüklendi (sklearn modeli yüklenmedi): {compiled_path}")
+        return True
+
+    def _load_compiled(self):
+        """Varsa derlenmiş orman dosyasını yükler ve sklearn çıktısıyla karşılaştırır."""
+        compiled_path = self._fresh_compiled_path()
+        if compiled_path is None:
+            return
+        try:
+            compiled = CompiledForest.load(compiled_path, mmap_mode='r' if self.mmap else None)
+            self._check_feature_names(compiled)
+            if compiled.n_estimators != len(self.model.estimators_):
+                raise ValueError("ağaç sayısı model dosyasıyla uyuşmuyor")
+            # Küçük bir örnek üzerinde sklearn ile aynı sonucu verdiğini doğrula
+            sample = self._feature_matrix(
+                [40.99, 41.05], [29.06, 28.98], [41.04, 41.01], [29.25, 28.85],
+                [16.4, 11.2], [72.0, 250.0], [8, 18], [3, 5], [11, 6]
+            )
+            diff = np.abs(compiled.predict(sample) - self._sklearn_predict(sample)).max()
+            if diff > self.COMPILED_TOLERANCE:
+                raise ValueError(f"sklearn çıktısından sapma {diff:.2e}")
+            self.compiled = compiled
+            print(f"✅ Derlenmiş model yüklendi: {compiled_path}")
+        except Exception as e:
+            print(f"❌ Derlenmiş model kullanılamıyor: {e}")
+
+    def _load_grid(self):
+        """Hız grid'ini bellek eşlemeli olarak açar."""
+        npy_path, json_path = grid_paths_for(self.model_path)
+        if not (os.path.exists(npy_path) and os.path.exists(json_path)):
+            print(f"⚠️ Hız grid'i bulunamadı: {npy_path}. 'train_model.py --build-grid' çalıştırın. Orman kullanılacak.")
+            return
+        if os.path.getmtime(npy_path) < os.path.getmtime(self.model_path):
+            print(f"⚠️ Hız grid'i modelden eski, kullanılmıyor: {npy_path}")
+            return
+        try:
+            self.grid = SpeedGrid.load(npy_path, json_path)
+            budget = self.grid.meta.get('error_budget', {})
+            same_tile = budget.get('short_routes', {}).get('same_tile', {})
+            print(f"✅ Hız grid'i yüklendi: {npy_path} (MAE {budget.get('mae_kmh')} km/h, p95 {budget.get('p95_kmh')} km/h, "
+                  f"aynı karede MAE {same_tile.get('mae_kmh')} km/h)")
+        except Exception as e:
+            print(f"❌ Hız grid'i yüklenemedi: {e}")
+
+    def warm_up(self):
+        """Birkaç örnek tahminle tembel ilklendirmeleri ve mmap sayfalarını ısıtır"""
+        if self.model is None:
+            return
+        when = dt.datetime(2025, 1, 6, 8, 30)
+        self.predict_route(40.9982, 29.0643, 41.0421, 29.2510, when)
+        self.predict_routes([41.0082, 40.9901], [28.9784, 29.0287], [41.0766, 41.0421], [29.0232, 29.2510], [when, when])
+
+    @property
+    def serving_mode(self):
+        """Tahminlerin gerçekte nereden geldiği: 'grid' veya 'forest'"""
+        return 'grid' if self.grid is not None else 'forest'
+
+    def _predict_matrix(self, X):
+        """Küçük gruplarda derlenmiş ormanla, diğer durumlarda sklearn modeliyle tahmin yapar.
+
+        sklearn modeli yüklenmemişse (mmap modu) her boyutta derlenmiş orman kullanılır.
+        """
+        if self.compiled is not None and (self.model is self.compiled or len(X) <= self.COMPILED_MAX_ROWS):
+            return self.compiled.predict(X)
+        return self._sklearn_predict(X)
+
+    def _sklearn_predict(self, X):
+        # Özellik adları ve sırası model yüklenirken doğrulandığı için, NumPy girdisinde
+        # sklearn'ün "feature names" uyarısı gereksizdir
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='X does not have valid feature names', category=UserWarning)
+            return self.model.predict(X)
+
+    def _check_feature_names(self, model):
+        """Modelin özellik adlarının ve sırasının FEATURES ile aynı olduğunu doğrular.
+
+        Tahminler modele adsız NumPy dizisi olarak verildiği için kolon sırası
+        burada bir kez kontrol edilir.
+        """
+        names = getattr(model, 'feature_names_in_', None)
+        if names is not None and list(names) != FEATURES:
+            raise ValueError(f"Model özellik sırası beklenenden farklı: {list(names)} != {FEATURES}")
+        n_features = getattr(model, 'n_features_in_', len(FEATURES))
+        if n_features != len(FEATURES):
+            raise ValueError(f"Model {n_features} özellik bekliyor, {len(FEATURES)} değil")
+
+    def _feature_matrix(self, start_lat, start_lon, end_lat, end_lon, distance, bearing, hour, day_of_week, month):
+        """Özellikleri FEATURES sırasıyla önceden ayrılmış bir float dizisine yazar"""
+        columns = {
+            'start_lat': start_lat,
+            'start_lon': start_lon,
+            'end_lat': end_lat,
+            'end_lon': end_lon,
+            'distance': distance,
+            'bearing': bearing,
+            'hour': hour,
+            'day_of_week': day_of_week,
+            'month': month
+        }
+        X = np.empty((np.size(start_lat), len(FEATURES)), dtype=np.float64)
+        for i, name in enumerate(FEATURES):
+            X[:, i] = columns[name]
+        return X
 
     def _haversine_distance(self, lat1, lon1, lat2, lon2):
         """İki nokta arası mesafeyi km cinsinden hesaplar"""
@@ -44,35 +433,153 @@ class TrafficModel:
         return bearing
 
     def predict_route(self, start_lat, start_lon, end_lat, end_lon, input_datetime):
-        """Rota bazlı tahmin yapar (yeni model için)"""
+        """Rota bazlı tahmin yapar (yeni model için).
+
+        input_datetime bir datetime nesnesi ya da ISO formatlı metin olabilir.
+        """
         if self.model is None:
             return None 
 
-        dt_obj = pd.to_datetime(input_datetime)
-        
+        dt_obj = parse_datetime(input_datetime)
+        start_lat, start_lon = float(start_lat), float(start_lon)
+        end_lat, end_lon = float(end_lat), float(end_lon)
+
+        if self.grid is not None:
+            speeds, inside = self.grid.lookup(
+                start_lat, start_lon, end_lat, end_lon, dt_obj.hour, dt_obj.weekday(), dt_obj.month
+            )
+            if inside:
+                return float(speeds)
+
         # Rota özelliklerini hesapla
         distance = self._haversine_distance(start_lat, start_lon, end_lat, end_lon)
         bearing = self._calculate_bearing(start_lat, start_lon, end_lat, end_lon)
-        
-        input_data = pd.DataFrame({
-            'start_lat': [float(start_lat)],
-            'start_lon': [float(start_lon)],
-            'end_lat': [float(end_lat)],
-            'end_lon': [float(end_lon)],
-            'distance': [distance],
-            'bearing': [bearing],
-            'hour': [dt_obj.hour],
-            'day_of_week': [dt_obj.dayofweek],
-            'month': [dt_obj.month]
-        })
+
+        input_data = self._feature_matrix(
+            start_lat, start_lon, end_lat, end_lon, distance, bearing,
+            dt_obj.hour, dt_obj.weekday(), dt_obj.month
+        )
 
         try:
-            prediction = self.model.predict(input_data)
+            prediction = self._predict_matrix(input_data)
             return float(prediction[0])
         except Exception as e:
             print(f"Tahmin hatası: {e}")
             return None
 
+    def predict_routes(self, start_lats, start_lons, end_lats, end_lons, input_datetimes):
+        """Birden fazla rota için tek seferde tahmin yapar.
+
+        Tüm özellikler NumPy dizileri üzerinde hesaplanır ve model tek bir
+        predict çağrısıyla çalıştırılır. Sonuçlar girdi sırasıyla döner.
+        """
+        if self.model is None:
+            return None
+
+        dt_objs = [parse_datetime(value) for value in input_datetimes]
+        return self.predict_features(
+            start_lats, start_lons, end_lats, end_lons,
+            [d.hour for d in dt_objs],
+            [d.weekday() for d in dt_objs],
+            [d.month for d in dt_objs]
+        )
+
+    def predict_features(self, start_lats, start_lons, end_lats, end_lons, hours, days_of_week, months):
+        """Koordinat ve zaman özelliği dizilerinden toplu tahmin yapar.
+
+        Mesafe ve yön burada vektörel hesaplanır. Grid modunda bbox içindeki
+        rotalar grid'den okunur, kalanlar tek bir model çağrısıyla tahmin edilir.
+        """
+        if self.model is None:
+            return None
+
+        # Girdiler ortak şekle genişletilir (ör. tek bir saat ya da N x 1 ile 1 x M
+        # koordinatlar); hesap düz diziler üzerinde yapılıp sonuç bu şekle döner
+        arrays = np.broadcast_arrays(
+            np.asarray(start_lats, dtype=float), np.asarray(start_lons, dtype=float),
+            np.asarray(end_lats, dtype=float), np.asarray(end_lons, dtype=float),
+            np.asarray(hours), np.asarray(days_of_week), np.asarray(months)
+        )
+        shape = arrays[0].shape
+        start_lats, start_lons, end_lats, end_lons, hours, days_of_week, months = [a.ravel() for a in arrays]
+
+        result = None
+        rows = slice(None)
+        if self.grid is not None:
+            result, inside = self.grid.lookup(
+                start_lats, start_lons, end_lats, end_lons, hours, days_of_week, months
+            )
+            if inside.all():
+                return result.reshape(shape)
+            rows = ~inside
+
+        input_data = self._feature_matrix(
+            start_lats[rows], start_lons[rows], end_lats[rows], end_lons[rows],
+            haversine_distance_array(start_lats[rows], start_lons[rows], end_lats[rows], end_lons[rows]),
+            bearing_array(start_lats[rows], start_lons[rows], end_lats[rows], end_lons[rows]),
+            hours[rows], days_of_week[rows], months[rows]
+        )
+
+        try:
+            predictions = np.asarray(self._predict_matrix(input_data), dtype=float)
+        except Exception as e:
+            print(f"Toplu tahmin hatası: {e}")
+            return None
+
+        if result is None:
+            return predictions.reshape(shape)
+        result[rows] = predictions
+        return result.reshape(shape)
+
+    def predict_segments(self, start_lat, start_lon, end_lat, end_lon, input_datetime, num_segments=12):
+        """Rotayı num_segments parçaya bölüp her parçanın hızını tek çağrıda tahmin eder.
+
+        Parça uçları eğitimdeki gibi generate_route_points ile üretilir.
+        (noktalar, ham hızlar) döndürür; noktalar (num_segments + 1, 2) dizisidir.
+        """
+        if self.model is None:
+            return None, None
+
+        dt_obj = parse_datetime(input_datetime)
+        points = np.array(generate_route_points(
+            float(start_lat), float(start_lon), float(end_lat), float(end_lon), num_points=num_segments
+        ))
+        speeds = self.predict_features(
+            points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1],
+            dt_obj.hour, dt_obj.weekday(), dt_obj.month
+        )
+        return points, speeds
+
+    def predict_matrix(self, origin_lats, origin_lons, dest_lats, dest_lons, hour, day_of_week, month,
+                       max_cells=50000):
+        """N başlangıç x M varış noktası için ham hız matrisini döndürür.
+
+        Koordinatlar (N x 1) ve (1 x M) olarak genişletilir; bellek kullanımını
+        sınırlamak için matris, her biri en fazla max_cells hücrelik satır
+        blokları halinde hesaplanır.
+        """
+        if self.model is None:
+            return None
+
+        origin_lats = np.asarray(origin_lats, dtype=float)
+        origin_lons = np.asarray(origin_lons, dtype=float)
+        dest_lats = np.asarray(dest_lats, dtype=float)
+        dest_lons = np.asarray(dest_lons, dtype=float)
+
+        speeds = np.empty((len(origin_lats), len(dest_lats)), dtype=np.float64)
+        rows_per_block = max(1, max_cells // max(len(dest_lats), 1))
+        for start in range(0, len(origin_lats), rows_per_block):
+            block = slice(start, start + rows_per_block)
+            block_speeds = self.predict_features(
+                origin_lats[block, None], origin_lons[block, None],
+                dest_lats[None, :], dest_lons[None, :],
+                hour, day_of_week, month
+            )
+            if block_speeds is None:
+                return None
+            speeds[block] = block_speeds
+        return speeds
+
     def predict(self, latitude, longitude, input_datetime):
         """Eski model uyumluluğu için (tek nokta tahmini) - artık kullanılmıyor"""
         if self.model is None:
@@ -0,0 +1,209 @@
+"""
+Versiyonlu model dizini ve çalışma anında model değiştirme
+"""
+import os
+import threading
+import time
+import datetime as dt
+from model_loader import TrafficModel
+
+MODEL_FILENAME = 'trafik_modeli.pkl'
+CURRENT_FILENAME = 'CURRENT'
+LEGACY_VERSION = 'legacy'
+
+
+def new_version_name():
+    """Zaman damgasından yeni bir versiyon adı üretir (ör. 20250101-120000)"""
+    return dt.datetime.now().strftime('%Y%m%d-%H%M%S')
+
+
+class ModelRegistry:
+    """models/<versiyon>/trafik_modeli.pkl düzenindeki modelleri yönetir.
+
+    models/CURRENT dosyası aktif versiyonun adını tutar. Dizin ya da CURRENT
+    yoksa eski düzendeki legacy_path kullanılır ('legacy' versiyonu).
+    Yeni model arka planda yüklenip ısıtılır, ardından current referansı tek
+    bir atamayla değiştirilir. İşlemdeki istekler başta aldıkları modelle
+    tamamlanır, yarı yüklenmiş bir model hiçbir zaman görünmez.
+    """
+
+    def __init__(self, model_dir, legacy_path=MODEL_FILENAME, mode='forest', mmap=False):
+        self.model_dir = model_dir
+        self.legacy_path = legacy_path
+        self.mode = mode
+        self.mmap = mmap
+        self.current = None
+        # Yükleme sürerken True; son başarısız yüklemenin mesajı load_error'da
+        self.loading = False
+        self.load_error = None
+
+        self._reload_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._initial_load_started = False
+        self._swap_callbacks = []
+        self._watcher = None
+        self._failed_version = None
+
+    # ----------------------
+    #  Versiyonlar
+    # ----------------------
+    def active_version(self):
+        """models/CURRENT içindeki versiyonu, yoksa 'legacy' döndürür"""
+        try:
+            with open(os.path.join(self.model_dir, CURRENT_FILENAME)) as f:
+                version = f.read().strip()
+        except OSError:
+            return LEGACY_VERSION
+        return version or LEGACY_VERSION
+
+    def versions(self):
+        """Model dosyası bulunan versiyonları eskiden yeniye döndürür"""
+        if not os.path.isdir(self.model_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.model_dir)
+            if os.path.isfile(os.path.join(self.model_dir, name, MODEL_FILENAME))
+        )
+
+    def model_path(self, version):
+        if version == LEGACY_VERSION:
+            return self.legacy_path
+        return os.path.join(self.model_dir, version, MODEL_FILENAME)
+
+    def version_dir(self, version):
+        """Versiyon dizinini (gerekirse oluşturarak) döndürür"""
+        path = os.path.join(self.model_dir, version)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def create_version(self):
+        """Yeni, boş bir versiyon dizini oluşturur ve (versiyon, dizin) döndürür.
+
+        Aynı saniyede başlayan eğitimler (ya da aktif versiyon) birbirinin
+        dizinine yazmasın diye dizin exist_ok olmadan oluşturulur; ad alınmışsa
+        sonuna -1, -2, ... eklenir.
+        """
+        base = new_version_name()
+        suffix = 0
+        while True:
+            version = f"{base}-{suffix}" if suffix else base
+            path = os.path.join(self.model_dir, version)
+            try:
+                os.makedirs(path)
+                return version, path
+            except FileExistsError:
+                suffix += 1
+
+    def activate(self, version):
+        """models/CURRENT'ı atomik olarak yeni versiyona çevirir"""
+        if version != LEGACY_VERSION and not os.path.isfile(self.model_path(version)):
+            raise ValueError(f"Model versiyonu bulunamadı: {version}")
+        os.makedirs(self.model_dir, exist_ok=True)
+        tmp_path = os.path.join(self.model_dir, f".{CURRENT_FILENAME}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(version + '\n')
+        os.replace(tmp_path, os.path.join(self.model_dir, CURRENT_FILENAME))
+
+    # ----------------------
+    #  Yükleme ve değiştirme
+    # ----------------------
+    def on_swap(self, callback):
+        """Model değiştiğinde yeni modelle çağrılacak fonksiyonu kaydeder"""
+        self._swap_callbacks.append(callback)
+
+    def load(self, version):
+        """Versiyonu yükler ve birkaç örnek tahminle ısıtır; yüklenemezse None döner"""
+        started = time.perf_counter()
+        model = TrafficModel(self.model_path(version), mode=self.mode, mmap=self.mmap)
+        if model.model is None:
+            return None
+        model.warm_up()
+        model.version = version
+        model.loaded_at = dt.datetime.now(dt.timezone.utc)
+        model.load_seconds = time.perf_counter() - started
+        return model
+
+    def reload(self, version=None, force=False):
+        """Modeli (verilmezse aktif versiyonu) yükleyip current'ı değiştirir.
+
+        İstenen versiyon zaten aktifse (ör. admin isteği ve izleyici aynı
+        değişikliği yakaladıysa) force verilmedikçe tekrar yüklenmez.
+        Yeni model yüklenemezse eski model kullanılmaya devam eder ve False döner.
+        """
+        with self._reload_lock:
+            version = version or self.active_version()
+            current = self.current
+            if not force and current is not None and current.version == version:
+                self.loading = False
+                return True
+            self.loading = True
+            try:
+                model = self.load(version)
+            except Exception as e:
+                print(f"❌ Model yüklenirken hata: {e}")
+                model = None
+            finally:
+                self.loading = False
+            if model is None:
+                print(f"❌ Model versiyonu yüklenemedi, mevcut model korunuyor: {version}")
+                self._failed_version = version
+                self.load_error = f"Model versiyonu yüklenemedi: {version}"
+                return False
+            self._failed_version = None
+            self.load_error = None
+            self.current = model
+            print(f"🔄 Aktif model: {version} ({model.load_seconds:.2f} sn)")
+            for callback in self._swap_callbacks:
+                callback(model)
+            return True
+
+    def reload_async(self, version=None, force=False):
+        """reload'u arka plan thread'inde çalıştırır"""
+        self.loading = True
+        thread = threading.Thread(target=self.reload, args=(version, force), name='model-reload', daemon=True)
+        thread.start()
+        return thread
+
+    def load_in_background(self):
+        """İlk yüklemeyi süreç başına bir kez arka planda başlatır.
+
+        Sunucu portu model yüklenmesini beklemeden açar; yükleme bitene kadar
+        status() 'loading' döner.
+        """
+        with self._state_lock:
+            if self._initial_load_started or self.current is not None:
+                return
+            self._initial_load_started = True
+        self.reload_async()
+
+    def status(self):
+        """'ready', 'loading', 'failed' veya 'not_started' döndürür"""
+        if self.current is not None:
+            return 'ready'
+        if self.loading:
+            return 'loading'
+        if self.load_error:
+            return 'failed'
+        return 'not_started'
+
+    def start_watcher(self, interval):
+        """models/CURRENT'ı izler, versiyon değişince modeli yeniden yükler.
+
+        Her süreç kendi izleyicisini çalıştırır; böylece gunicorn worker'larının
+        hepsi aynı versiyona geçer.
+        """
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                current = self.current
+                active = self.active_version()
+                if active == self._failed_version:
+                    continue
+                if current is None or current.version != active:
+                    self.reload(active)
+
+        self._watcher = threading.Thread(target=watch, name='model-watcher', daemon=True)
+        self._watcher.start()
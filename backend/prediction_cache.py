@@ -0,0 +1,136 @@
+"""
+Rota tahminleri için LRU + TTL önbellek
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Model tahminlerini yuvarlanmış koordinat + zaman anahtarıyla saklar.
+
+    Model zamandan yalnızca saat, haftanın günü ve ayı gördüğü için anahtar
+    (yuvarlanmış koordinatlar, hour, day_of_week, month) şeklindedir.
+    Kapasite dolunca en uzun süredir kullanılmayan kayıt atılır; ttl verilirse
+    süresi dolan kayıtlar okunurken düşürülür. model_path verilirse dosya
+    değiştiğinde (mtime/boyut) önbellek otomatik temizlenir.
+    """
+
+    def __init__(self, max_size=10000, ttl=None, precision=3, model_path=None, check_interval=1.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.precision = precision
+        self.model_path = model_path
+        self.check_interval = check_interval
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_signature = self._read_model_signature()
+        self._last_check = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def make_key(self, start_lat, start_lon, end_lat, end_lon, dt_obj, model_version=None):
+        """Önbellek anahtarını oluşturur.
+
+        model_version anahtara eklenir; model değişirken eski modelle biten bir
+        istek yeni modelin kayıtlarını kirletemez.
+        """
+        p = self.precision
+        return (
+            round(start_lat, p), round(start_lon, p),
+            round(end_lat, p), round(end_lon, p),
+            dt_obj.hour, dt_obj.weekday(), dt_obj.month,
+            model_version
+        )
+
+    def get(self, key):
+        """Kayıt varsa değerini, yoksa None döndürür"""
+        if not self.enabled:
+            return None
+        self._check_model_file()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """Değeri önbelleğe yazar, kapasite aşılırsa en eski kaydı atar"""
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Tüm kayıtları siler"""
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def reset(self, model_path=None):
+        """Yeni model dosyasını izlemeye başlar ve önbelleği temizler"""
+        self.model_path = model_path
+        self._model_signature = self._read_model_signature()
+        self.clear()
+
+    def stats(self):
+        """/health için sayaçları döndürür"""
+        with self._lock:
+            size = len(self._data)
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": size,
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "precision": self.precision,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+    def _read_model_signature(self):
+        if not self.model_path:
+            return None
+        try:
+            st = os.stat(self.model_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _check_model_file(self):
+        """Model dosyası değiştiyse önbelleği temizler (en fazla check_interval'da bir)"""
+        if not self.model_path:
+            return
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        signature = self._read_model_signature()
+        if signature != self._model_signature:
+            self._model_signature = signature
+            self.clear()
+            print(f"♻️ Model dosyası değişti, tahmin önbelleği temizlendi: {self.model_path}")
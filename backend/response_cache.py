@@ -0,0 +1,158 @@
+"""
+Kullanıcı bazlı yanıt önbelleği (GET /history, GET /favorites)
+
+Her (liste türü, user_id) için bir versiyon tutulur; POST/DELETE işleyicileri ve
+write-behind yazıcısı commit'ten sonra versiyonu değiştirir. Serileştirilmiş
+JSON gövdeleri süreç içinde, okunduğu andaki versiyonla birlikte saklanır.
+Versiyon değişmediyse gövde veritabanına gitmeden döner, ETag ile
+If-None-Match eşleşirse 304 döner.
+
+Versiyonlar gunicorn worker'larının ortak gördüğü bellek eşlemeli bir dosyada
+durur: bir worker'daki yazma diğerlerinin önbelleğini de geçersiz kılar.
+Kullanıcılar sabit sayıda slota dağıtılır; aynı slotu paylaşan kullanıcılar
+yalnızca gereksiz bir yeniden okumaya yol açar, eski veri döndürmez.
+"""
+import hashlib
+import mmap
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+KINDS = ('history', 'favorites')
+DEFAULT_VERSION_FILE = os.path.join(tempfile.gettempdir(), f"traffic-response-versions-{os.getuid()}.bin") \
+    if hasattr(os, 'getuid') else None
+
+
+class ResponseCache:
+    """Versiyon kontrollü, toplam boyutla sınırlı LRU gövde önbelleği.
+
+    max_bytes=0 gövde önbelleğini kapatır (ETag/304 yine çalışır). ttl
+    verilirse kayıtlar versiyon değişmese de bu kadar saniye sonra yeniden
+    okunur; veritabanı uygulama dışından (başka sunucu, elle SQL) değişiyorsa
+    eskime süresini sınırlar.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=None, version_slots=65536, version_file=DEFAULT_VERSION_FILE):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version_slots = version_slots
+        self._versions = self._open_versions(version_file)
+
+        self._data = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _open_versions(self, path):
+        """Versiyon slotlarını paylaşılan belleğe eşler.
+
+        Dosya açılamazsa anonim paylaşımlı bellek kullanılır; bu yalnızca
+        uygulamayı fork'tan önce yükleyen süreçler (gunicorn preload) arasında
+        paylaşılır.
+        """
+        size = self.version_slots * 8
+        if path:
+            try:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    if os.fstat(fd).st_size < size:
+                        os.ftruncate(fd, size)
+                    return memoryview(mmap.mmap(fd, size)).cast('Q')
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                print(f"⚠️ Yanıt önbelleği versiyon dosyası açılamadı ({path}): {e}")
+        return memoryview(mmap.mmap(-1, size)).cast('Q')
+
+    def _slot(self, kind, user_id):
+        return (int(user_id) * len(KINDS) + KINDS.index(kind)) % self.version_slots
+
+    def version(self, kind, user_id):
+        return self._versions[self._slot(kind, user_id)]
+
+    def invalidate(self, kind, user_ids):
+        """Kullanıcıların listesinin değiştiğini bildirir; commit'ten sonra çağrılmalıdır.
+
+        Versiyon artırılmak yerine rastgele yeni bir değer alır: süreçler arası
+        kilit olmadan aynı anda yapılan iki yazma da okuyucuların gördüğü
+        değerden farklı bir versiyon bırakır.
+        """
+        if isinstance(user_ids, int):
+            user_ids = (user_ids,)
+        for user_id in user_ids:
+            self._versions[self._slot(kind, user_id)] = random.getrandbits(64)
+
+    def lookup(self, kind, user_id, variant=None):
+        """(kayıt, versiyon) döndürür; kayıt geçerli değilse None'dır.
+
+        Versiyon veritabanı okunmadan önce alınır ve store()'a verilir; okuma
+        sırasında gelen bir yazma, kaydı sonraki istekte geçersiz kılar.
+        """
+        version = self.version(kind, user_id)
+        if not self.enabled:
+            return None, version
+        key = (kind, user_id, variant)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                entry_version, etag, body, expires_at = entry
+                if entry_version == version and (expires_at is None or expires_at > now):
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return (etag, body), version
+                self._pop(key)
+            self.misses += 1
+            return None, version
+
+    def store(self, kind, user_id, variant, version, body):
+        """Gövdeyi önbelleğe yazar ve (etag, body) döndürür"""
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        if not self.enabled or len(body) > self.max_bytes:
+            return etag, body
+        key = (kind, user_id, variant)
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (version, etag, body, expires_at)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                self._pop(next(iter(self._data)))
+                self.evictions += 1
+        return etag, body
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[2])
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            entries, size = len(self._data), self._size
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,28 @@
+"""
+Uygulama başlatıcı
+
+SERVER_MODE=production (varsayılan): gunicorn, preforking worker'lar (gunicorn.conf.py)
+SERVER_MODE=development: Flask geliştirme sunucusu (python app.py ile aynı)
+"""
+import os
+import sys
+
+
+def main():
+    mode = os.getenv('SERVER_MODE', 'production')
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    if mode == 'development':
+        from app import app, start_background_tasks
+        start_background_tasks()
+        app.run(host="0.0.0.0", port=int(os.getenv('PORT', 5001)), debug=False)
+        return
+
+    print(f">> Gunicorn başlatılıyor: {os.getenv('WEB_CONCURRENCY', 2)} worker, "
+          f"{os.getenv('GUNICORN_THREADS', 4)} thread")
+    # Süreç gunicorn ile değiştirilir, sinyaller doğrudan master'a gider
+    os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'])
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,36 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
+from scipy.spatial import cKDTree
 import joblib
 from math import radians, cos, sin, asin, sqrt, atan2, degrees
+import argparse
+import hashlib
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+from data_ingest import (
+    DEFAULT_CACHE_DIR, DEFAULT_CSV, load_traffic_data, read_columns,
+    resolve_input_files, source_fingerprint, write_columns
+)
+from model_loader import (
+    FEATURES, ISTANBUL_BBOX, SpeedGrid, TrafficModel, bearing_array,
+    compile_forest, compiled_path_for, generate_route_points, grid_paths_for,
+    haversine_distance_array
+)
+from model_registry import MODEL_FILENAME, ModelRegistry
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Rota veri setinin kolonları (model özellikleri + hedef)
+ROUTE_COLUMNS = FEATURES + ['avg_speed']
+
+# Versiyon dizininde ağaç gruplarının geçmişi (artımlı eğitim için)
+TRAINING_HISTORY_FILENAME = 'training_history.json'
+
+# create_route_dataset'in çıktısını değiştiren bir düzeltmede artırılır;
+# eski rota veri seti önbellekleri böylece kullanılmaz
+ROUTE_DATASET_FORMAT = 1
 
 def haversine_distance(lat1, lon1, lat2, lon2):
     """İki nokta arası mesafeyi km cinsinden hesaplar (Haversine formülü)"""
@@ -29,118 +56,304 @@ def calculate_bearing(lat1, lon1, lat2, lon2):
     bearing = (bearing + 360) % 360
     return bearing
 
-def generate_route_points(lat1, lon1, lat2, lon2, num_points=12):
-    """İki nokta arası rota noktalarını oluşturur"""
-    points = []
-    for i in range(num_points + 1):
-        ratio = i / num_points
-        current_lat = lat1 + (lat2 - lat1) * ratio
-        current_lon = lon1 + (lon2 - lon1) * ratio
-        points.append((current_lat, current_lon))
-    return points
-
-def create_route_dataset(df, num_routes_per_timestamp=5):
-    """CSV verilerinden rota bazlı veri seti oluşturur"""
+class NearestSensorIndex:
+    """Bir zaman dilimindeki sensörler üzerinde en yakın sensör araması (KD-ağacı).
+
+    Sonuç, her rota noktası için tüm grupla np.sqrt mesafesi hesaplayıp idxmin
+    almakla birebir aynıdır. Aynı koordinatta birden fazla satır varsa gruptaki
+    ilki seçilir. En yakın iki aday float hassasiyetinde eşitse o nokta eski
+    yöntemle hesaplanır.
+    """
+
+    # İki aday arasındaki bu göreli farkın altı eşitlik sayılır
+    TIE_TOLERANCE = 1e-9
+
+    def __init__(self, lats, lons):
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        valid = np.flatnonzero(np.isfinite(self.lats) & np.isfinite(self.lons))
+        coords = np.column_stack([self.lats[valid], self.lons[valid]])
+        # np.unique her koordinatın ilk geçtiği satırı döndürür (idxmin ile aynı seçim)
+        unique, first = np.unique(coords, axis=0, return_index=True)
+        self.positions = valid[first]
+        self.tree = cKDTree(unique)
+
+    def query(self, points):
+        """(N, 2) rota noktaları için en yakın sensörün gruptaki sırasını döndürür"""
+        points = np.asarray(points, dtype=float)
+        if len(self.positions) == 1:
+            return np.zeros(len(points), dtype=np.intp) + self.positions[0]
+
+        distances, idx = self.tree.query(points, k=2)
+        nearest = self.positions[idx[:, 0]]
+        ties = np.flatnonzero(distances[:, 1] - distances[:, 0] <= self.TIE_TOLERANCE * distances[:, 1])
+        for i in ties:
+            exact = np.sqrt((self.lats - points[i, 0])**2 + (self.lons - points[i, 1])**2)
+            nearest[i] = np.nanargmin(exact)
+        return nearest
+
+
+def create_route_dataset(df, num_routes_per_timestamp=5, seed=None, workers=1, num_points=12):
+    """CSV verilerinden rota bazlı veri seti oluşturur.
+
+    Rota noktalarına en yakın sensörler, zaman dilimindeki sensörler üzerine
+    kurulan KD-ağacından tek sorguyla bulunur. Aynı sensör kümesi (aynı
+    koordinatlar, aynı sıra) için ağaç yeniden kurulmaz. seed verilirse rota
+    çiftleri ayrı bir RandomState ile seçilir ve aynı veriden her zaman aynı veri
+    seti üretilir; verilmezse global np.random kullanılır.
+
+    workers > 1 ise zaman dilimleri süreç havuzuna dağıtılır (bkz.
+    _create_route_dataset_parallel). Bu modda her zaman diliminin kendi
+    tohumlu üreteci vardır: aynı seed ile sonuç worker sayısından bağımsızdır,
+    ancak seri moddaki rastgele sayı akışından farklı rotalar seçilir.
+    """
     print("🔄 Rota veri seti oluşturuluyor...")
-    
-    route_data = []
-    
+
     # Zaman dilimlerine göre grupla
     df['DATE_TIME'] = pd.to_datetime(df['DATE_TIME'])
+    if workers > 1:
+        return _create_route_dataset_parallel(df, num_routes_per_timestamp, seed, workers, num_points)
+
+    rng = np.random.RandomState(seed) if seed is not None else np.random
+    columns = {name: [] for name in ROUTE_COLUMNS}
+    index_cache = {}
     grouped = df.groupby('DATE_TIME')
-    
+
     total_groups = len(grouped)
     processed = 0
-    
+
     for timestamp, group in grouped:
         if len(group) < 2:
             continue
-        
-        # Aynı zaman dilimindeki noktalardan rastgele rota çiftleri oluştur
-        group_indices = group.index.tolist()
-        
+
+        # Aynı zaman dilimindeki noktalardan rastgele rota çiftleri oluştur.
+        # Seçim gruptaki sıra üzerinden yapılır; rng.randint(n) ile liste
+        # elemanı seçmek rng.choice(liste) ile aynı rastgele sayı akışını kullanır.
+        available = list(range(len(group)))
+        pairs = []
+
         for _ in range(min(num_routes_per_timestamp, len(group) // 2)):
-            if len(group_indices) < 2:
+            if len(available) < 2:
                 break
-            
+
             # Rastgele başlangıç ve varış noktaları seç
-            start_idx = np.random.choice(group_indices)
-            group_indices.remove(start_idx)
-            
-            if len(group_indices) == 0:
+            start_pos = available.pop(rng.randint(len(available)))
+
+            if len(available) == 0:
                 break
-                
-            end_idx = np.random.choice(group_indices)
-            group_indices.remove(end_idx)
-            
-            start_row = group.loc[start_idx]
-            end_row = group.loc[end_idx]
-            
-            start_lat = start_row['LATITUDE']
-            start_lon = start_row['LONGITUDE']
-            end_lat = end_row['LATITUDE']
-            end_lon = end_row['LONGITUDE']
-            
-            # Rota noktalarını oluştur
-            route_points = generate_route_points(start_lat, start_lon, end_lat, end_lon, num_points=12)
-            
-            # Rota üzerindeki noktalara en yakın veri noktalarını bul ve ortalama hızı hesapla
-            route_speeds = []
-            for r_lat, r_lon in route_points:
-                # En yakın noktayı bul (basit mesafe hesabı)
-                distances = np.sqrt(
-                    (group['LATITUDE'] - r_lat)**2 + 
-                    (group['LONGITUDE'] - r_lon)**2
-                )
-                nearest_idx = distances.idxmin()
-                nearest_speed = group.loc[nearest_idx, 'AVERAGE_SPEED']
-                route_speeds.append(nearest_speed)
-            
-            avg_route_speed = np.mean(route_speeds)
-            
+
+            end_pos = available.pop(rng.randint(len(available)))
+            pairs.append((start_pos, end_pos))
+
+        if not pairs:
+            processed += 1
+            continue
+
+        lats = group['LATITUDE'].to_numpy(dtype=float)
+        lons = group['LONGITUDE'].to_numpy(dtype=float)
+        speeds = group['AVERAGE_SPEED'].to_numpy(dtype=float)
+
+        # Sensör kümesi değişmediyse KD-ağacı yeniden kurulmaz
+        key = lats.tobytes() + lons.tobytes()
+        index = index_cache.get(key)
+        if index is None:
+            if len(index_cache) >= 32:
+                index_cache.pop(next(iter(index_cache)))
+            index = index_cache[key] = NearestSensorIndex(lats, lons)
+
+        # Rota noktalarını oluştur ve hepsinin en yakın sensörünü tek seferde bul
+        route_points = []
+        for start_pos, end_pos in pairs:
+            route_points.extend(generate_route_points(
+                lats[start_pos], lons[start_pos], lats[end_pos], lons[end_pos], num_points=num_points
+            ))
+        nearest = index.query(route_points).reshape(len(pairs), -1)
+
+        # Zaman özellikleri
+        dt = pd.to_datetime(timestamp)
+
+        for k, (start_pos, end_pos) in enumerate(pairs):
+            start_lat, start_lon = lats[start_pos], lons[start_pos]
+            end_lat, end_lon = lats[end_pos], lons[end_pos]
+
+            # Rota üzerindeki noktalara en yakın veri noktalarının ortalama hızı
+            avg_route_speed = np.mean(speeds[nearest[k]])
+
             # Rota özelliklerini hesapla
             distance = haversine_distance(start_lat, start_lon, end_lat, end_lon)
             bearing = calculate_bearing(start_lat, start_lon, end_lat, end_lon)
-            
-            # Zaman özellikleri
-            dt = pd.to_datetime(timestamp)
-            
-            route_data.append({
-                'start_lat': start_lat,
-                'start_lon': start_lon,
-                'end_lat': end_lat,
-                'end_lon': end_lon,
-                'distance': distance,
-                'bearing': bearing,
-                'hour': dt.hour,
-                'day_of_week': dt.dayofweek,
-                'month': dt.month,
-                'avg_speed': avg_route_speed
-            })
-        
+
+            row = (start_lat, start_lon, end_lat, end_lon, distance, bearing,
+                   dt.hour, dt.dayofweek, dt.month, avg_route_speed)
+            for name, value in zip(ROUTE_COLUMNS, row):
+                columns[name].append(value)
+
         processed += 1
         if processed % 100 == 0:
-            print(f"  İşlenen zaman dilimi: {processed}/{total_groups} ({len(route_data)} rota oluşturuldu)")
-    
-    print(f"✅ Toplam {len(route_data)} rota verisi oluşturuldu.")
-    return pd.DataFrame(route_data)
+            print(f"  İşlenen zaman dilimi: {processed}/{total_groups} ({len(columns['avg_speed'])} rota oluşturuldu)")
+
+    print(f"✅ Toplam {len(columns['avg_speed'])} rota verisi oluşturuldu.")
+    return pd.DataFrame(columns) if columns['avg_speed'] else pd.DataFrame()
+
+
+def _routes_for_groups(task):
+    """Süreç havuzu işi: ardışık zaman dilimlerinin rotalarını kolon dizileri olarak üretir.
+
+    bounds[i]:bounds[i+1] i. zaman diliminin satırlarıdır. Her zaman dilimi
+    default_rng([seed, sıra no]) ile kendi üretecini kullanır; böylece sonuç
+    zaman diliminin hangi parçaya ya da worker'a düştüğüne bağlı değildir.
+    """
+    lats, lons, speeds, bounds, timestamps, ordinals, num_routes, seed, num_points = task
+    ratios = np.arange(num_points + 1) / num_points  # generate_route_points ile aynı noktalar
+    index_cache = {}
+    parts = []
+
+    for i, ordinal in enumerate(ordinals):
+        lo, hi = bounds[i], bounds[i + 1]
+        n = hi - lo
+        if n < 2:
+            continue
+        rng = np.random.default_rng([seed, int(ordinal)])
+        k = min(num_routes, n // 2)
+        chosen = rng.choice(n, size=2 * k, replace=False)
+        start_pos, end_pos = chosen[0::2], chosen[1::2]
+
+        group_lats, group_lons = lats[lo:hi], lons[lo:hi]
+        key = group_lats.tobytes() + group_lons.tobytes()
+        index = index_cache.get(key)
+        if index is None:
+            if len(index_cache) >= 32:
+                index_cache.pop(next(iter(index_cache)))
+            index = index_cache[key] = NearestSensorIndex(group_lats, group_lons)
+
+        start_lat, start_lon = group_lats[start_pos], group_lons[start_pos]
+        end_lat, end_lon = group_lats[end_pos], group_lons[end_pos]
+        point_lats = start_lat[:, None] + (end_lat - start_lat)[:, None] * ratios
+        point_lons = start_lon[:, None] + (end_lon - start_lon)[:, None] * ratios
+        nearest = index.query(np.column_stack([point_lats.ravel(), point_lons.ravel()])).reshape(k, -1)
+
+        dt = pd.Timestamp(timestamps[i])
+        parts.append((
+            start_lat, start_lon, end_lat, end_lon,
+            haversine_distance_array(start_lat, start_lon, end_lat, end_lon),
+            bearing_array(start_lat, start_lon, end_lat, end_lon),
+            np.full(k, dt.hour), np.full(k, dt.dayofweek), np.full(k, dt.month),
+            speeds[lo:hi][nearest].mean(axis=1)
+        ))
+
+    if not parts:
+        return {name: np.empty(0) for name in ROUTE_COLUMNS}
+    return {name: np.concatenate(values) for name, values in zip(ROUTE_COLUMNS, zip(*parts))}
+
+
+def _create_route_dataset_parallel(df, num_routes_per_timestamp, seed, workers, num_points):
+    """Zaman dilimlerini parçalara bölüp süreç havuzunda işler, kolonları sırayla birleştirir"""
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % 2**63)
+        print(f"  Tohum verilmedi, kullanılan tohum: {seed} (tekrarlamak için --seed {seed})")
+
+    # Satırları zamana göre kararlı sırala: groupby gibi grup içi sıra korunur, NaT atlanır
+    times = df['DATE_TIME'].to_numpy()
+    valid = np.flatnonzero(~pd.isna(times))
+    order = valid[np.argsort(times[valid], kind='stable')]
+    timestamps, first = np.unique(times[order], return_index=True)
+    bounds = np.append(first, len(order))
+
+    lats = df['LATITUDE'].to_numpy(dtype=float)[order]
+    lons = df['LONGITUDE'].to_numpy(dtype=float)[order]
+    speeds = df['AVERAGE_SPEED'].to_numpy(dtype=float)[order]
+
+    # Worker başına birkaç parça: yük dengesi için yeterince küçük, süreçler arası
+    # kopyalama için yeterince büyük
+    n_groups = len(timestamps)
+    if n_groups == 0:
+        print("✅ Toplam 0 rota verisi oluşturuldu.")
+        return pd.DataFrame()
+    chunks = [c for c in np.array_split(np.arange(n_groups), min(n_groups, workers * 4)) if len(c)]
+    tasks = []
+    for chunk in chunks:
+        lo, hi = bounds[chunk[0]], bounds[chunk[-1] + 1]
+        tasks.append((
+            lats[lo:hi], lons[lo:hi], speeds[lo:hi],
+            bounds[chunk[0]:chunk[-1] + 2] - lo, timestamps[chunk], chunk,
+            num_routes_per_timestamp, seed, num_points
+        ))
 
-def train_and_save_model():
+    print(f"  {n_groups} zaman dilimi {len(tasks)} parça halinde {workers} sürece dağıtılıyor...")
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for done, result in enumerate(pool.map(_routes_for_groups, tasks), start=1):
+            results.append(result)
+            if done % workers == 0 or done == len(tasks):
+                print(f"  İşlenen parça: {done}/{len(tasks)}")
+
+    columns = {name: np.concatenate([r[name] for r in results]) for name in ROUTE_COLUMNS} if results else {}
+    total = len(columns['avg_speed']) if columns else 0
+    print(f"✅ Toplam {total} rota verisi oluşturuldu.")
+    return pd.DataFrame(columns) if total else pd.DataFrame()
+
+def route_dataset_cache_path(files, num_routes_per_timestamp, num_points, seed, workers,
+                             cache_dir=DEFAULT_CACHE_DIR):
+    """Rota veri seti önbelleğinin yolu.
+
+    Anahtar: kaynak dosyaların içerik parmak izi, rota sayısı, ara nokta sayısı,
+    tohum ve seri/paralel mod (ikisi aynı tohumla farklı rotalar seçer).
+    """
+    params = {
+        'format': ROUTE_DATASET_FORMAT,
+        'source': source_fingerprint(files),
+        'num_routes_per_timestamp': num_routes_per_timestamp,
+        'num_points': num_points,
+        'seed': seed,
+        'parallel': workers > 1
+    }
+    key = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return os.path.join(cache_dir, f"routes-{key}.npz")
+
+
+def load_route_dataset(data=DEFAULT_CSV, num_routes_per_timestamp=5, num_points=12, seed=None,
+                       workers=1, use_cache=True, rebuild=False):
+    """Rota veri setini önbellekten yükler, yoksa CSV'lerden üretip önbelleğe yazar.
+
+    Önbellek sadece seed verildiğinde kullanılır; tohumsuz veri seti zaten her
+    çalıştırmada farklıdır. rebuild=True veri setini yeniden üretip önbelleğin
+    üzerine yazar, use_cache=False CSV ve rota önbelleklerinin ikisini de atlar.
+    """
+    files = resolve_input_files(data)
+    cache_path = None
+    if use_cache and seed is not None:
+        cache_path = route_dataset_cache_path(files, num_routes_per_timestamp, num_points, seed, workers)
+        if not rebuild and os.path.exists(cache_path):
+            route_df = pd.DataFrame(read_columns(cache_path, ROUTE_COLUMNS))
+            print(f"⚡ Rota veri seti önbellekten yüklendi: {len(route_df)} rota ({os.path.basename(cache_path)})")
+            return route_df
+    elif use_cache:
+        print("ℹ️ Tohum verilmediği için rota veri seti önbelleklenmiyor (--seed ile tekrar kullanılabilir)")
+
+    df = load_traffic_data(files, cache_dir=DEFAULT_CACHE_DIR, use_cache=use_cache)
+    print(f"📊 Yüklenen ölçüm sayısı: {len(df)} ({df.memory_usage(deep=True).sum() / 1e6:.1f} MB)")
+
+    print("⚙️ Rota bazlı veri seti oluşturuluyor...")
+    route_df = create_route_dataset(df, num_routes_per_timestamp=num_routes_per_timestamp, seed=seed,
+                                    workers=workers, num_points=num_points)
+    if cache_path and len(route_df):
+        write_columns(cache_path, {name: route_df[name].to_numpy() for name in ROUTE_COLUMNS})
+        print(f"💾 Rota veri seti önbelleğe yazıldı: {os.path.basename(cache_path)}")
+    return route_df
+
+
+def train_and_save_model(seed=None, workers=1, data=DEFAULT_CSV, use_data_cache=True, rebuild_dataset=False,
+                         registry=None):
     print("⏳ Veri yükleniyor...")
-    
-    # CSV dosyası bir üst klasörde
-    csv_path = os.path.join(os.path.dirname(__file__), '..', 'ibb_traffic_2024_12.csv')
-    csv_path = os.path.normpath(csv_path)
-    
+
+    # data: CSV yolları ya da glob desenleri (varsayılan: bir üst klasördeki aylık CSV)
     try:
-        df = pd.read_csv(csv_path)
-    except FileNotFoundError:
-        print(f"HATA: '{csv_path}' dosyası bulunamadı!")
+        route_df = load_route_dataset(data, num_routes_per_timestamp=5, seed=seed, workers=workers,
+                                      use_cache=use_data_cache, rebuild=rebuild_dataset)
+    except FileNotFoundError as e:
+        print(f"HATA: '{e}' dosyası bulunamadı!")
         return
 
-    print("⚙️ Rota bazlı veri seti oluşturuluyor...")
-    route_df = create_route_dataset(df, num_routes_per_timestamp=5)
-    
     if len(route_df) == 0:
         print("❌ Rota veri seti oluşturulamadı!")
         return
@@ -167,11 +380,257 @@ def train_and_save_model():
     score = model.score(X_test, y_test)
     print(f"✅ Model Eğitimi Tamamlandı! Başarı Skoru (R^2): {score:.2f}")
 
-    # Model dosyasını backend klasörüne kaydet
-    model_path = os.path.join(os.path.dirname(__file__), 'trafik_modeli.pkl')
+    history = [{'data': [os.path.basename(path) for path in resolve_input_files(data)],
+                'trees': len(model.estimators_), 'holdout_r2': round(score, 4)}]
+    save_model_version(model, registry or get_registry(), history)
+
+def save_model_version(model, registry, history):
+    """Modeli yeni bir versiyon olarak kaydeder ve aktif eder.
+
+    history: ağaç gruplarının eskiden yeniye listesi (hangi veriyle kaç ağaç
+    eğitildiği); artımlı eğitim en eski ağaçları bu sırayla emekliye ayırır.
+    """
+    version, version_dir = registry.create_version()
+    model_path = os.path.join(version_dir, MODEL_FILENAME)
     joblib.dump(model, model_path)
+    with open(os.path.join(version_dir, TRAINING_HISTORY_FILENAME), 'w') as f:
+        json.dump(history, f, indent=2)
     print(f"💾 Model '{model_path}' olarak kaydedildi.")
+    export_compiled_model(model_path, model)
+    registry.activate(version)
+    print(f"✅ Aktif model versiyonu: {version} (çalışan sunucular izleyiciyle geçiş yapar)")
+    return version
+
+def train_incremental(data, add_trees=20, max_trees=200, seed=None, workers=1, use_data_cache=True,
+                      rebuild_dataset=False, registry=None):
+    """Aktif ormanı yeni ayın verisiyle eğitilen ağaçlarla genişletir (warm_start).
+
+    Yeni ayın rota veri setinin %20'si ayrılır; eski ve yeni modelin R² skoru bu
+    en güncel veri üzerinde raporlanır. Toplam ağaç sayısı max_trees'i aşarsa en
+    eski ağaçlar atılır. Sonuç tam eğitimdeki gibi yeni bir versiyon olarak
+    kaydedilip aktif edilir.
+    """
+    registry = registry or get_registry()
+    base_version = registry.active_version()
+    base_path = registry.model_path(base_version)
+    if not os.path.exists(base_path):
+        print(f"❌ Artımlı eğitim için aktif model bulunamadı: '{base_path}' (önce tam eğitim yapın)")
+        return
+    model = joblib.load(base_path)
+    history = _load_training_history(base_path, model)
+    print(f"📦 Temel model: {base_version} ({len(model.estimators_)} ağaç)")
+
+    print("⏳ Yeni veri yükleniyor...")
+    try:
+        route_df = load_route_dataset(data, num_routes_per_timestamp=5, seed=seed, workers=workers,
+                                      use_cache=use_data_cache, rebuild=rebuild_dataset)
+    except FileNotFoundError as e:
+        print(f"HATA: '{e}' dosyası bulunamadı!")
+        return
+    if len(route_df) == 0:
+        print("❌ Rota veri seti oluşturulamadı!")
+        return
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        route_df[FEATURES], route_df['avg_speed'], test_size=0.2, random_state=42
+    )
+    base_score = model.score(X_test, y_test)
+    print(f"📊 Yeni veri: {len(route_df)} rota; temel modelin yeni veri R^2'si: {base_score:.3f}")
+
+    print(f"🚀 {add_trees} yeni ağaç eğitiliyor...")
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + add_trees)
+    model.fit(X_train, y_train)
+    history.append({'data': [os.path.basename(path) for path in resolve_input_files(data)],
+                    'trees': add_trees, 'holdout_r2': None})
+
+    retired = retire_oldest_trees(model, max_trees, history)
+    if retired:
+        print(f"🗑️ En eski {retired} ağaç emekliye ayrıldı (üst sınır: {max_trees})")
+
+    score = model.score(X_test, y_test)
+    history[-1]['holdout_r2'] = round(score, 4)
+    print(f"✅ Artımlı eğitim tamamlandı! Yeni veri R^2: {base_score:.3f} -> {score:.3f} "
+          f"({len(model.estimators_)} ağaç)")
+    return save_model_version(model, registry, history)
+
+def retire_oldest_trees(model, max_trees, history):
+    """Orman max_trees'ten büyükse en eski ağaçları atar, history'yi de buna göre kırpar"""
+    excess = len(model.estimators_) - max_trees
+    if excess <= 0:
+        return 0
+    model.estimators_ = model.estimators_[excess:]
+    model.n_estimators = len(model.estimators_)
+
+    remaining = excess
+    while remaining and history:
+        dropped = min(remaining, history[0]['trees'])
+        history[0]['trees'] -= dropped
+        remaining -= dropped
+        if history[0]['trees'] == 0:
+            history.pop(0)
+    return excess
+
+def _load_training_history(model_path, model):
+    """Versiyonun ağaç geçmişini okur; eski versiyonlarda tüm orman tek grup sayılır"""
+    path = os.path.join(os.path.dirname(model_path), TRAINING_HISTORY_FILENAME)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return [{'data': [], 'trees': len(model.estimators_), 'holdout_r2': None}]
+
+def get_registry():
+    """Sunucunun kullandığı backend/models dizinini yöneten registry"""
+    return ModelRegistry(
+        os.path.join(BACKEND_DIR, 'models'),
+        legacy_path=os.path.join(BACKEND_DIR, MODEL_FILENAME)
+    )
+
+def export_compiled_model(model_path, model=None):
+    """Ormanı model_loader.CompiledForest'ın okuduğu düz dizi formatında kaydeder"""
+    if model is None:
+        model = joblib.load(model_path)
+    compiled_path = compiled_path_for(model_path)
+    joblib.dump(compile_forest(model), compiled_path)
+    print(f"💾 Derlenmiş model '{compiled_path}' olarak kaydedildi.")
+
+def _grid_error_stats(error):
+    """Grid ve tam model arasındaki mutlak hız farklarının özeti (km/h)"""
+    if len(error) == 0:
+        return {'num_samples': 0}
+    return {
+        'num_samples': int(len(error)),
+        'mae_kmh': round(float(error.mean()), 3),
+        'p95_kmh': round(float(np.percentile(error, 95)), 3),
+        'max_kmh': round(float(error.max()), 3)
+    }
+
+def build_speed_grid(model_path, n_lat=8, n_lon=8, bbox=ISTANBUL_BBOX, dtype='float16',
+                     num_check_samples=20000, seed=42):
+    """Modeli bbox üzerindeki kare merkezleri x ay x gün x saat için önceden hesaplar.
+
+    Sonuç TrafficModel(mode='grid') tarafından bellek eşlemeli okunur. Grid'in
+    tam modele göre hatası rastgele rotalar üzerinde ölçülüp meta veriye
+    (error_budget) yazılır. Rastgele uçlar neredeyse hiç aynı ya da komşu
+    kareye düşmediği için kısa (şehir içi) rotaların hatası ayrıca
+    (short_routes) ölçülür; karelere bölmenin etkisi en çok bu rotalarda görülür.
+    """
+    traffic_model = TrafficModel(model_path, mode='forest')
+    if traffic_model.model is None:
+        print("❌ Grid için model yüklenemedi!")
+        return
+
+    meta = {
+        'bbox': list(bbox),
+        'n_lat': n_lat,
+        'n_lon': n_lon,
+        'dtype': dtype,
+        'shape_order': ['origin_tile', 'dest_tile', 'month', 'day_of_week', 'hour']
+    }
+    n_tiles = n_lat * n_lon
+    values = np.empty((n_tiles, n_tiles, 12, 7, 24), dtype=dtype)
+    grid = SpeedGrid(values, meta)
+    tile_lats, tile_lons = grid.tile_centers()
+
+    # Bir başlangıç karesi için tüm (varış karesi, ay, gün, saat) kombinasyonları
+    dest_tiles, months, days, hours = [
+        a.ravel() for a in np.meshgrid(
+            np.arange(n_tiles), np.arange(1, 13), np.arange(7), np.arange(24), indexing='ij'
+        )
+    ]
+    print(f"🧮 Hız grid'i hesaplanıyor: {n_tiles}x{n_tiles} kare, {values.size} hücre...")
+    for origin in range(n_tiles):
+        speeds = traffic_model.predict_features(
+            tile_lats[origin], tile_lons[origin], tile_lats[dest_tiles], tile_lons[dest_tiles],
+            hours, days, months
+        )
+        values[origin] = speeds.reshape(n_tiles, 12, 7, 24)
+        if (origin + 1) % 8 == 0:
+            print(f"  İşlenen başlangıç karesi: {origin + 1}/{n_tiles}")
+
+    # Hata bütçesi: bbox içindeki rastgele rotalarda grid ve tam model karşılaştırması
+    rng = np.random.RandomState(seed)
+    lat_min, lon_min, lat_max, lon_max = bbox
+    sample = [
+        rng.uniform(lat_min, lat_max, num_check_samples), rng.uniform(lon_min, lon_max, num_check_samples),
+        rng.uniform(lat_min, lat_max, num_check_samples), rng.uniform(lon_min, lon_max, num_check_samples),
+        rng.randint(0, 24, num_check_samples), rng.randint(0, 7, num_check_samples), rng.randint(1, 13, num_check_samples)
+    ]
+    exact = traffic_model.predict_features(*sample)
+    approx, _ = grid.lookup(*sample)
+    meta['error_budget'] = _grid_error_stats(np.abs(approx - exact))
+
+    # Kısa rotalar: varış, başlangıçtan her eksende en fazla bir kare uzakta
+    # (aynı ya da komşu kare). Bu rotalarda grid, kare merkezleri arasındaki
+    # (aynı karede sıfır) mesafeyle okunur.
+    lat_step, lon_step = (lat_max - lat_min) / n_lat, (lon_max - lon_min) / n_lon
+    start_lats, start_lons = rng.uniform(lat_min, lat_max, num_check_samples), rng.uniform(lon_min, lon_max, num_check_samples)
+    short = [
+        start_lats, start_lons,
+        np.clip(start_lats + rng.uniform(-1, 1, num_check_samples) * lat_step, lat_min, np.nextafter(lat_max, lat_min)),
+        np.clip(start_lons + rng.uniform(-1, 1, num_check_samples) * lon_step, lon_min, np.nextafter(lon_max, lon_min)),
+        rng.randint(0, 24, num_check_samples), rng.randint(0, 7, num_check_samples), rng.randint(1, 13, num_check_samples)
+    ]
+    exact = traffic_model.predict_features(*short)
+    approx, _ = grid.lookup(*short)
+    error = np.abs(approx - exact)
+    origin_tiles, _ = grid.tile_index(short[0], short[1])
+    same_tile = origin_tiles == grid.tile_index(short[2], short[3])[0]
+    meta['error_budget']['short_routes'] = {
+        'same_tile': _grid_error_stats(error[same_tile]),
+        'adjacent_tile': _grid_error_stats(error[~same_tile])
+    }
+
+    npy_path, json_path = grid_paths_for(model_path)
+    np.save(npy_path, values)
+    with open(json_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    print(f"💾 Hız grid'i '{npy_path}' olarak kaydedildi ({values.nbytes / 1e6:.1f} MB).")
+    print(f"📊 Grid hata bütçesi: {meta['error_budget']}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rota bazlı trafik modelini eğitir")
+    parser.add_argument('--compile-only', action='store_true',
+                        help="Eğitim yapmadan aktif model versiyonu için derlenmiş modeli üretir")
+    parser.add_argument('--build-grid', action='store_true',
+                        help="Aktif model versiyonu için hız grid'ini (MODEL_MODE=grid) üretir")
+    parser.add_argument('--grid-size', type=int, nargs=2, default=[8, 8], metavar=('N_LAT', 'N_LON'),
+                        help="Grid'in enlem ve boylam kare sayısı (varsayılan: 8 8)")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="Rota veri seti için rastgelelik tohumu (verilirse veri seti tekrarlanabilir)")
+    parser.add_argument('--data', nargs='+', default=[DEFAULT_CSV], metavar='CSV',
+                        help="Eğitim CSV'leri ya da glob desenleri, ör. 'data/ibb_traffic_2024_*.csv' "
+                             "(varsayılan: ../ibb_traffic_2024_12.csv)")
+    parser.add_argument('--no-data-cache', action='store_true',
+                        help="CSV ve rota veri seti önbelleklerini kullanma (önbelleğe de yazma)")
+    parser.add_argument('--rebuild-dataset', action='store_true',
+                        help="Önbellekte olsa bile rota veri setini yeniden üret ve önbelleği güncelle")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Rota veri setini üreten süreç sayısı (varsayılan: 1, seri)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Aktif modeli --data ile verilen yeni ayın verisiyle eğitilen ağaçlarla genişletir")
+    parser.add_argument('--add-trees', type=int, default=20,
+                        help="Artımlı eğitimde eklenecek ağaç sayısı (varsayılan: 20)")
+    parser.add_argument('--max-trees', type=int, default=200,
+                        help="Artımlı eğitimde toplam ağaç üst sınırı; aşılırsa en eski ağaçlar atılır (varsayılan: 200)")
+    parser.add_argument('--grid-dtype', choices=['float16', 'float32'], default='float16',
+                        help="Grid hücre tipi (varsayılan: float16)")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    train_and_save_model()
+    args = parse_args()
+    registry = get_registry()
+    model_path = registry.model_path(registry.active_version())
+    if args.compile_only:
+        export_compiled_model(model_path)
+    elif args.build_grid:
+        n_lat, n_lon = args.grid_size
+        build_speed_grid(model_path, n_lat=n_lat, n_lon=n_lon, dtype=args.grid_dtype)
+    elif args.incremental:
+        train_incremental(args.data, add_trees=args.add_trees, max_trees=args.max_trees, seed=args.seed,
+                          workers=args.workers, use_data_cache=not args.no_data_cache,
+                          rebuild_dataset=args.rebuild_dataset)
+    else:
+        train_and_save_model(seed=args.seed, workers=args.workers, data=args.data,
+                             use_data_cache=not args.no_data_cache, rebuild_dataset=args.rebuild_dataset)
 
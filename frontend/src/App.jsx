@@ -7,6 +7,11 @@ import {
 } from "@react-google-maps/api";
 
 const BACKEND_URL = import.meta.env.VITE_BACKEND_URL || "http://localhost:5001";
+// /predict geçmiş kaydını kuyruğa alır, kayıt backend'in HISTORY_FLUSH_INTERVAL
+// (varsayılan 0.5 sn) aralığıyla yazılır. Liste yeni kayıt görünene kadar bu
+// aralıklarla yoklanır (toplam ~15 sn; yavaş ya da tekrar denenen yazmalar için).
+// Değişmeyen liste backend'de önbellekten/304 ile döner, yoklama DB'ye gitmez.
+const HISTORY_POLL_DELAYS_MS = [500, 1000, 2000, 4000, 8000];
 
 
 const defaultCenter = { lat: 41.015137, lng: 28.97953 }; // İstanbul
@@ -481,19 +486,33 @@ function TrafficPage({ user, onLogout }) {
     }
   }, [user, activeTab]);
 
-  const loadHistory = async () => {
-    if (!user?.id) return;
-    setLoadingHistory(true);
+  // silent: arka plan yoklamasında yükleniyor göstergesi açılmaz
+  const loadHistory = async ({ silent = false } = {}) => {
+    if (!user?.id) return null;
+    if (!silent) setLoadingHistory(true);
     try {
       const res = await fetch(`${BACKEND_URL}/history?user_id=${user.id}`);
       if (res.ok) {
         const data = await res.json();
         setHistory(data.history || []);
+        return data.history || [];
       }
     } catch (err) {
       console.error("History yükleme hatası:", err);
     } finally {
-      setLoadingHistory(false);
+      if (!silent) setLoadingHistory(false);
+    }
+    return null;
+  };
+
+  // Kuyruğa alınan kayıt listede görünene kadar geçmişi yeniler. createdAt,
+  // /predict'in döndürdüğü history_created_at'tir; created_at'ler aynı ISO
+  // biçiminde (UTC, saat dilimsiz) olduğu için metin olarak karşılaştırılır.
+  const waitForHistoryEntry = async (createdAt) => {
+    for (const delay of HISTORY_POLL_DELAYS_MS) {
+      await new Promise((resolve) => setTimeout(resolve, delay));
+      const entries = await loadHistory({ silent: true });
+      if (entries?.some((entry) => entry.created_at && entry.created_at >= createdAt)) return;
     }
   };
 
@@ -587,6 +606,13 @@ function TrafficPage({ user, onLogout }) {
         end_lon: endLoc.lng(),
       };
 
+      // Giriş yapılmışsa arama, backend tarafından geçmişe kaydedilir
+      if (user?.id) {
+        payload.user_id = user.id;
+        payload.origin = origin;
+        payload.destination = destination;
+      }
+
       const res = await fetch(`${BACKEND_URL}/predict`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
@@ -614,39 +640,9 @@ function TrafficPage({ user, onLogout }) {
         destination,
       });
 
-      // Arama geçmişine kaydet
-      if (user?.id) {
-        try {
-          const historyRes = await fetch(`${BACKEND_URL}/history`, {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({
-              user_id: user.id,
-              origin,
-              destination,
-              origin_lat: startLoc.lat(),
-              origin_lon: startLoc.lng(),
-              destination_lat: endLoc.lat(),
-              destination_lon: endLoc.lng(),
-              datetime: form.datetime,
-              traffic_level: data.traffic_level,
-              traffic_label: data.traffic_label,
-              speed_kmh: data.speed_kmh,
-              estimated_minutes: data.estimated_minutes,
-              distance_km: data.distance_km,
-            }),
-          });
-          
-          if (historyRes.ok) {
-            // History kaydedildi, listeyi yenile
-            loadHistory();
-          } else {
-            const errData = await historyRes.json().catch(() => ({}));
-            console.error("History kaydetme hatası:", errData.error || "Bilinmeyen hata");
-          }
-        } catch (err) {
-          console.error("History kaydetme hatası:", err);
-        }
+      // Geçmiş kaydı /predict ile kuyruğa alındı, yazılınca liste yenilenir
+      if (data.history_queued) {
+        waitForHistoryEntry(data.history_created_at);
       }
     } catch (err) {
       console.error(err);